@@ -0,0 +1,116 @@
+import argparse
+import math
+import time
+from src import HealthcareSystem, DEFAULT_SEED, RESULT_LABELS
+from replication import DEFAULT_PARAMS, run_replications
+
+#Function to calculate the Erlang B formula: blocking probability of an M/M/servers/servers loss system with offered load (arrival rate / service rate).
+#Uses the numerically stable recursion B(0) = 1, B(k) = load * B(k - 1) / (k + load * B(k - 1)).
+def erlang_b(servers, load):
+    blocking = 1.0
+    for k in range(1, servers + 1):
+        blocking = load * blocking / (k + load * blocking)
+    return blocking
+
+#Function to calculate the Erlang C formula: probability that an arrival waits in an M/M/servers queue with offered load.
+#The queue is unstable if load >= servers, every arrival eventually waits then. (returns 1)
+def erlang_c(servers, load):
+    if load >= servers:
+        return 1.0
+    blocking = erlang_b(servers, load)
+    return servers * blocking / (servers - load * (1.0 - blocking))
+
+#Function to calculate the steady-state values of the metrics of get_results analytically:
+#   triage: M/M/S queue with offered load a = myLambda / mu_t, all nurses are busy with probability Erlang C,
+#   beds: critical patients leave the stable M/M/S triage as a Poisson process (Burke) thinned by 1 - p1, so the bed stage is an
+#   M/M/K/K loss system with offered load b = myLambda * (1 - p1) / mu_cb, arrivals are rejected with probability Erlang B,
+#   home: infinite-server stage, stable patients heal in 1 / mu_s, rejected critical patients in alpha / mu_cb with E[alpha] = 1.5.
+#Only valid if the triage stage is stable (see analytic_validity).
+def analytic_results(S, K, mu_t, mu_cb, mu_s, myLambda, p1):
+    a = myLambda / mu_t
+    b = myLambda * (1 - p1) / mu_cb
+    waiting = erlang_c(S, a)
+    blocking = erlang_b(K, b)
+    results = {}
+    results["nurse_available"] = 1.0 - waiting
+    results["bed_available"] = 1.0 - blocking
+    results["joint"] = results["bed_available"] * results["nurse_available"]
+    results["bed_rejection_ratio"] = blocking
+    results["nurse_utilization"] = a / S
+    results["bed_utilization"] = b * (1.0 - blocking) / K
+    results["home_treated_fraction"] = p1 + (1.0 - p1) * blocking
+    triage_time = waiting / (S * mu_t - myLambda) + 1.0 / mu_t
+    results["time_to_heal"] = triage_time + p1 / mu_s + (1.0 - p1) * ((1.0 - blocking) / mu_cb + blocking * 1.5 / mu_cb)
+    return results
+
+#Function to check if the steady-state approximation is valid for a simulation run with the given parameters.
+#Returns None if it is valid, otherwise the reason. The approximation is invalid if the triage stage is unstable or if the run
+#is not min_horizon times longer than the relaxation time of the slowest stage: 1 / (S * mu_t * (1 - sqrt(rho))^2) for triage
+#and 1 / mu_cb for beds. The run length is estimated as healed_patients_limit / myLambda.
+def analytic_validity(params, min_horizon=100):
+    S = params["S"]
+    mu_t = params["mu_t"]
+    rho = params["myLambda"] / (S * mu_t) if S > 0 else math.inf
+    if rho >= 1:
+        return "triage stage is unstable (utilization " + str(rho) + ")"
+    if params["K"] < 1:
+        return "no hospital beds"
+    relaxation = max(1 / (S * mu_t * (1 - math.sqrt(rho)) ** 2), 1 / params["mu_cb"])
+    horizon = params["healed_patients_limit"] / params["myLambda"]
+    if horizon < min_horizon * relaxation:
+        return "run is too short for steady state (" + str(round(horizon, 1)) + " < " + str(min_horizon) + " * " + str(round(relaxation, 1)) + ")"
+    return None
+
+#Function to get the metrics of a simulation run, analytically if the approximation is valid, otherwise with run_simulation.
+#Returns {"results": ..., "method": "analytic" | "simulation", "reason": None or why the simulation was run}.
+def estimate(params, seed=DEFAULT_SEED, min_horizon=100):
+    reason = analytic_validity(params, min_horizon)
+    if reason is None:
+        results = analytic_results(params["S"], params["K"], params["mu_t"], params["mu_cb"], params["mu_s"], params["myLambda"], params["p1"])
+        return {"results": results, "method": "analytic", "reason": None}
+    system = HealthcareSystem(seed=seed, **params)
+    system.run_simulation()
+    return {"results": system.get_results(), "method": "simulation", "reason": reason}
+
+#Function to measure how far the analytic results are from the simulated metrics.
+#Returns per metric the analytic value, the simulated mean with its confidence interval (see replication.run_replications),
+#the absolute and relative error and whether the analytic value is inside the interval.
+def validate(params, replications=20, seed=DEFAULT_SEED, workers=None, confidence=0.95):
+    analytic = analytic_results(params["S"], params["K"], params["mu_t"], params["mu_cb"], params["mu_s"], params["myLambda"], params["p1"])
+    summary = run_replications(params, replications, seed, workers, confidence)["summary"]
+    validation = {}
+    for name in RESULT_LABELS:
+        row = summary[name]
+        error = analytic[name] - row["mean"]
+        validation[name] = {"analytic": analytic[name], "simulated": row["mean"], "half_width": row["half_width"], "error": error,
+                            "relative_error": abs(error) / abs(row["mean"]) if row["mean"] else math.nan,
+                            "covered": row["lower"] <= analytic[name] <= row["upper"]}
+    return validation
+
+#Command line entry point of the validation harness. Compares the analytic results with the metrics printed by src.py
+#(one run with its parameters) and with replications of a long run.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate the analytic estimator against the simulation.")
+    parser.add_argument("-R", "--replications", type=int, default=20, help="number of replications of the long run")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="root seed of the replications")
+    parser.add_argument("--limit", type=int, default=100000, help="number of healed patients of the long run")
+    arguments = parser.parse_args(argv)
+    main_params = dict(DEFAULT_PARAMS, engine="classic", retention="full")
+    start = time.perf_counter()
+    analytic = analytic_results(main_params["S"], main_params["K"], main_params["mu_t"], main_params["mu_cb"], main_params["mu_s"], main_params["myLambda"], main_params["p1"])
+    elapsed = time.perf_counter() - start
+    output = estimate(main_params)
+    print("Analytic results in " + str(round(elapsed * 1e6, 1)) + " us")
+    print("src.py run (limit " + str(main_params["healed_patients_limit"]) + "): " + output["method"] + " estimate, " + str(output["reason"]))
+    validation = validate(dict(DEFAULT_PARAMS, healed_patients_limit=arguments.limit), arguments.replications, arguments.seed, arguments.workers)
+    for name, label in RESULT_LABELS.items():
+        row = validation[name]
+        print(label)
+        print("analytic: " + str(row["analytic"]) + "  src.py: " + str(output["results"][name]))
+        print("long run: " + str(row["simulated"]) + " +- " + str(row["half_width"]) + "  relative error: " + str(round(row["relative_error"], 5))
+              + ("" if row["covered"] else "  (outside the interval)"))
+        print("--")
+
+if __name__ == "__main__":
+    main()
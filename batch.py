@@ -0,0 +1,183 @@
+import argparse
+import heapq
+import math
+import time
+import numpy as np
+from src import HealthcareSystem, DEFAULT_SEED, RESULT_LABELS, create_streams
+from replication import DEFAULT_PARAMS, spawn_seeds
+
+#Parameters of HealthcareSystem that the batch engine uses. Other parameters (engine, retention etc.) are ignored.
+BATCH_PARAMS = ("S", "K", "mu_t", "mu_cb", "mu_s", "myLambda", "p1", "healed_patients_limit", "start_type")
+
+#Function to calculate the time a stage is full (all servers busy) over [0, end_time] from the service intervals of the stage.
+#Only full periods that are closed by a service end before end_time are counted, as the event-driven engine does.
+def _full_time(service_starts, service_ends, servers, end_time):
+    starts = service_starts[service_starts <= end_time]
+    ends = service_ends[service_ends <= end_time]
+    times = np.concatenate((ends, starts))
+    deltas = np.concatenate((np.full(len(ends), -1), np.ones(len(starts), dtype=np.int64)))
+    order = np.lexsort((deltas, times))     #At equal times service ends come first.
+    times = times[order]
+    busy = np.cumsum(deltas[order])
+    lengths = np.diff(times)
+    return float(np.sum(lengths[busy[:-1] == servers]))
+
+#Function to simulate the model with the first n arrivals. Returns None if n arrivals are not enough to reach healed_patients_limit.
+#Random streams are consumed in the same order as the event-driven engines consume them, so the sample path is the same:
+#   triage: FIFO M/M/S waits from the Kiefer-Wolfowitz recursion, the workload vector is a heap of nurse free times,
+#   routing and home treatments: vectorized over the triage departures sorted by time,
+#   beds: M/M/K/K loss system, the free-time structure is a heap of K bed free times.
+def _simulate(S, K, mu_t, mu_cb, mu_s, myLambda, p1, healed_patients_limit, start_type, seed, block_size, n):
+    streams = create_streams(seed, block_size)
+    if start_type == "empty":
+        num_triage = 0
+        num_bed = 0
+    elif start_type == "half":
+        num_triage = math.floor(S / 2)
+        num_bed = math.floor(K / 2)
+    else:
+        num_triage = S
+        num_bed = K
+
+    #Arrivals and triage stage.
+    services = streams["triage"].take(num_triage + n)[1] * (1 / mu_t)
+    interarrivals = streams["arrivals"].take(n)[1] * (1 / myLambda)
+    arrival_times = np.concatenate(([0.0], np.cumsum(interarrivals[:-1])))
+    nurse_heap = [(float(services[i]), i) for i in range(num_triage)] + [(0.0, i) for i in range(num_triage, S)]
+    heapq.heapify(nurse_heap)
+    starts = np.empty(n)
+    nurses = np.empty(n, dtype=np.int64)
+    heapreplace = heapq.heapreplace
+    for i, (arrival_time, service) in enumerate(zip(arrival_times.tolist(), services[num_triage:].tolist())):
+        free_time, nurse = nurse_heap[0]
+        start = arrival_time if arrival_time > free_time else free_time
+        heapreplace(nurse_heap, (start + service, nurse))
+        starts[i] = start
+        nurses[i] = nurse
+    #Triage departures, initial patients first. (index j < num_triage: initial patient, else arrival j - num_triage)
+    triage_starts = np.concatenate((np.zeros(num_triage), starts))
+    departures = np.concatenate((0 + services[:num_triage], starts + services[num_triage:]))
+    triage_nurses = np.concatenate((np.arange(num_triage), nurses))
+    order = np.argsort(departures, kind="stable")
+    routing = np.empty(len(departures))
+    routing[order] = streams["routing"].take(len(departures))[0]
+    stable = routing < p1
+
+    #Home treatment of stable patients.
+    exits = np.empty(len(departures))
+    stable_order = order[stable[order]]
+    exits[stable_order] = departures[stable_order] + streams["home_stable"].take(len(stable_order))[1] * (1 / mu_s)
+
+    #Hospital beds for critical patients in departure order.
+    critical_order = order[~stable[order]]
+    hospital_times = streams["bed"].take(num_bed + len(critical_order))[1] * (1 / mu_cb)
+    hospital_list = hospital_times.tolist()
+    bed_heap = [(hospital_list[b], b) for b in range(num_bed)] + [(0.0, b) for b in range(num_bed, K)]
+    heapq.heapify(bed_heap)
+    admitted = np.zeros(len(departures), dtype=bool)
+    beds = np.full(len(departures), -1, dtype=np.int64)
+    admissions = 0
+    for patient, departure in zip(critical_order.tolist(), departures[critical_order].tolist()):
+        if bed_heap and bed_heap[0][0] < departure:
+            bed = bed_heap[0][1]
+            exit_time = departure + hospital_list[num_bed + admissions]
+            heapreplace(bed_heap, (exit_time, bed))
+            exits[patient] = exit_time
+            admitted[patient] = True
+            beds[patient] = bed
+            admissions += 1
+    rejected = ~stable & ~admitted
+    rejected_order = order[rejected[order]]
+    uniforms, exponentials = streams["home_critical"].take(2 * len(rejected_order))
+    alpha = ((1.75 - 1.25) * uniforms[0::2]) + 1.25
+    exits[rejected_order] = departures[rejected_order] + exponentials[1::2] * (1 / (mu_cb / alpha))
+
+    #Stop time: the healed_patients_limit-th exit, including the patients of the initial beds.
+    initial_bed_exits = 0 + hospital_times[:num_bed]
+    all_exits = np.concatenate((exits, initial_bed_exits))
+    if len(all_exits) < healed_patients_limit:
+        return None
+    end_time = float(np.partition(all_exits, healed_patients_limit - 1)[healed_patients_limit - 1])
+    if end_time >= arrival_times[-1]:
+        return None
+
+    #Metrics over [0, end_time], calculated as HealthcareSystem.get_results does.
+    departed = departures <= end_time
+    worked_time = np.bincount(triage_nurses[departed], weights=services[departed], minlength=S)
+    hospital_exited = admitted & (exits <= end_time)
+    occupied_time = np.bincount(beds[hospital_exited], weights=(exits - departures)[hospital_exited], minlength=K)
+    initial_exited = initial_bed_exits <= end_time
+    occupied_time += np.bincount(np.arange(num_bed)[initial_exited], weights=hospital_times[:num_bed][initial_exited], minlength=K)
+    bed_starts = np.concatenate((np.zeros(num_bed), departures[admitted]))
+    bed_ends = np.concatenate((initial_bed_exits, exits[admitted]))
+    num_patients_arrived = int(np.count_nonzero(arrival_times <= end_time))
+    num_patients_arrived_beds = int(np.count_nonzero(~stable & departed))
+    num_patients_rejected_beds = int(np.count_nonzero(rejected & departed))
+    treated_home = int(np.count_nonzero(~admitted & (exits <= end_time)))
+    arrived_exits = exits[num_triage:]
+    healed = arrived_exits <= end_time
+    time_spent = (arrived_exits - arrival_times)[healed]
+    time_spent = time_spent[time_spent > 0]
+
+    results = {}
+    results["nurse_available"] = (end_time - _full_time(triage_starts, departures, S, end_time)) / end_time
+    results["bed_available"] = (end_time - _full_time(bed_starts, bed_ends, K, end_time)) / end_time
+    results["joint"] = results["bed_available"] * results["nurse_available"]
+    results["bed_rejection_ratio"] = num_patients_rejected_beds / num_patients_arrived_beds if num_patients_arrived_beds > 0 else math.nan
+    results["nurse_utilization"] = float(np.mean(worked_time / end_time)) if S > 0 else math.nan
+    results["bed_utilization"] = float(np.mean(occupied_time / end_time)) if K > 0 else math.nan
+    results["home_treated_fraction"] = treated_home / num_patients_arrived
+    results["time_to_heal"] = math.fsum(time_spent.tolist()) / len(time_spent) if len(time_spent) > 0 else math.nan
+    return results
+
+#Function to run the simulation model with the batch engine and return the same metrics as HealthcareSystem.get_results.
+#The number of simulated arrivals is doubled until healed_patients_limit patients are healed before the last simulated arrival.
+#Only the FIFO (longest_idle) selection policy is modeled.
+def run_batch_simulation(S, K, mu_t, mu_cb, mu_s, myLambda, p1, healed_patients_limit, start_type, seed=DEFAULT_SEED, block_size=4096):
+    n = int(1.25 * healed_patients_limit) + 100
+    while True:
+        results = _simulate(S, K, mu_t, mu_cb, mu_s, myLambda, p1, healed_patients_limit, start_type, seed, block_size, n)
+        if results is not None:
+            return results
+        n *= 2
+
+#Function to cross-validate the batch engine against the event-driven fast engine.
+#Both engines are run with the same replication seeds, so they simulate the same sample paths and their results
+#should only differ by floating point rounding. Returns the maximum absolute difference per metric and the run times.
+def cross_validate(params, replications=10, seed=DEFAULT_SEED):
+    batch_params = {name: params[name] for name in BATCH_PARAMS}
+    differences = {name: 0.0 for name in RESULT_LABELS}
+    event_time = 0.0
+    batch_time = 0.0
+    for child in spawn_seeds(seed, replications):
+        start = time.perf_counter()
+        system = HealthcareSystem(seed=child, engine="fast", **batch_params)
+        system.run_simulation()
+        event_results = system.get_results()
+        event_time += time.perf_counter() - start
+        start = time.perf_counter()
+        batch_results = run_batch_simulation(seed=child, **batch_params)
+        batch_time += time.perf_counter() - start
+        for name in RESULT_LABELS:
+            if not (math.isnan(event_results[name]) and math.isnan(batch_results[name])):
+                differences[name] = max(differences[name], abs(event_results[name] - batch_results[name]))
+    return {"max_difference": differences, "event_time": event_time, "batch_time": batch_time}
+
+#Command line entry point of the cross-validation.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validate the batch engine against the event-driven engine.")
+    parser.add_argument("-R", "--replications", type=int, default=10, help="number of replications")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="root seed of the replications")
+    parser.add_argument("--limit", type=int, default=100000, help="number of healed patients to stop the simulation")
+    parser.add_argument("--start_type", choices=("empty", "half", "full"), default=DEFAULT_PARAMS["start_type"], help="start condition of the system")
+    arguments = parser.parse_args(argv)
+    params = dict(DEFAULT_PARAMS, healed_patients_limit=arguments.limit, start_type=arguments.start_type)
+    output = cross_validate(params, arguments.replications, arguments.seed)
+    for name, label in RESULT_LABELS.items():
+        print(label)
+        print("max |event - batch|: " + str(output["max_difference"][name]))
+        print("--")
+    print("Event-driven engine: " + str(round(output["event_time"], 3)) + " s, batch engine: " + str(round(output["batch_time"], 3)) + " s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+import numpy as np
+from src import HealthcareSystem, Instrumentation, FEL_TYPES, ENGINES, RETENTION_MODES, EVENT_TYPES, create_event_list
+
+#Parameters of the simulation model used by the benchmarks, unless overridden. (same as the ones used in src.py)
+BENCHMARK_PARAMS = {
+    "S": 4,
+    "K": 7,
+    "mu_t": 0.357142857,
+    "mu_cb": 0.142857143,
+    "mu_s": 0.16,
+    "myLambda": 1,
+    "p1": 0.2,
+    "healed_patients_limit": 100000,
+    "start_type": "empty",
+}
+
+#Grid of the benchmark suite. Load factor is myLambda / (S * mu_t).
+SUITE_GRID = {
+    "load": (0.5, 0.8, 0.95),
+    "K": (7, 50),
+    "start_type": ("empty", "half", "full"),
+    "healed_patients_limit": (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7),
+}
+BASELINE_VERSION = 1    #Version of the baseline file format.
+
+#Function to count the events executed by a fast engine run. Every event except the first arrival was pushed with a sequence number.
+def count_events(system):
+    return system.sequence - len(system.event_list) + 1
+
+#Function to measure the time of one hold operation (pop the next event, push it back with a random increment) on a future event list of the given size.
+#Increments mimic the healthcare model: a fraction long_fraction are long home treatments with mean long_mean, the rest have mean short_mean.
+def hold_benchmark(fel, size, operations=200000, long_fraction=0.5, short_mean=1.0, long_mean=100.0, seed=0):
+    generator = np.random.default_rng(seed)
+    initial = generator.exponential(long_mean, size).tolist()
+    long = generator.random(operations) < long_fraction
+    increments = np.where(long, generator.exponential(long_mean, operations), generator.exponential(short_mean, operations)).tolist()
+    event_list = create_event_list(fel)
+    for sequence, event_time in enumerate(initial):
+        event_list.push((event_time, sequence, 0, 0, -1))
+    push = event_list.push
+    pop = event_list.pop
+    sequence = size
+    start = time.perf_counter()
+    for increment in increments:
+        entry = pop()
+        push((entry[0] + increment, sequence, 0, 0, -1))
+        sequence += 1
+    return (time.perf_counter() - start) / operations * 1e9
+
+#Function to find the smallest future event list size at which the calendar queue is faster than the heap in the hold model.
+#Returns the measured rows (size, ns per hold of every FEL type) and the crossover size. (None if the heap is always faster)
+def fel_crossover(sizes=(10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6), operations=200000, long_fraction=0.5, long_mean=100.0):
+    rows = []
+    crossover = None
+    for size in sizes:
+        row = {"size": size}
+        for fel in FEL_TYPES:
+            row[fel] = hold_benchmark(fel, size, operations, long_fraction, long_mean=long_mean)
+        rows.append(row)
+        if crossover is None and row["calendar"] < row["heap"]:
+            crossover = size
+    return rows, crossover
+
+#Function to push and pop a random sequence of entries through every FEL type and check that they dequeue in the same order.
+#Like in a simulation, pushed entries are never earlier than the last popped one. The number of pending entries rises and falls
+#and the increments change scale between phases, so the calendar queue grows, shrinks and changes its bucket width many times.
+#Returns the number of the first operation where the pop orders differ. (None if they are the same)
+def check_fel_order(operations=200000, seed=0):
+    generator = np.random.default_rng(seed)
+    phase_length = max(1, operations // 20)
+    scales = generator.choice((0.01, 1.0, 100.0), operations // phase_length + 1)
+    pop_probabilities = generator.choice((0.3, 0.5, 0.7), operations // phase_length + 1)
+    draws = generator.random(operations).tolist()
+    increments = generator.exponential(1.0, operations).tolist()
+    orders = []
+    for fel in FEL_TYPES:
+        event_list = create_event_list(fel)
+        now = 0.0
+        order = []
+        for sequence in range(operations):
+            phase = sequence // phase_length
+            if len(event_list) > 0 and draws[sequence] < pop_probabilities[phase]:
+                entry = event_list.pop()
+                now = entry[0]
+                order.append(entry[1])
+            else:
+                event_list.push((now + increments[sequence] * scales[phase], sequence, 0, 0, -1))
+        while len(event_list) > 0:
+            order.append(event_list.pop()[1])
+        orders.append(order)
+    for order in orders[1:]:
+        for index, (expected, found) in enumerate(zip(orders[0], order)):
+            if expected != found:
+                return index
+        if len(order) != len(orders[0]):
+            return min(len(order), len(orders[0]))
+    return None
+
+#Function to check that runs with every variant (dict of HealthcareSystem arguments) give bit-identical results (see
+#HealthcareSystem.get_results) for every start type and seed. Returns the (start_type, seed, metric) triples whose results differ.
+def check_same_results(variants, start_types=("empty", "half", "full"), seeds=(0, 1, 2), healed_patients_limit=20000, home_mean=100.0):
+    mismatches = []
+    for start_type in start_types:
+        for seed in seeds:
+            results = []
+            for variant in variants:
+                params = dict(BENCHMARK_PARAMS, healed_patients_limit=healed_patients_limit, start_type=start_type, mu_s=1 / home_mean)
+                system = HealthcareSystem(seed=seed, **dict(params, **variant))
+                system.run_simulation()
+                results.append(system.get_results())
+            for name, expected in results[0].items():
+                if any(repr(other[name]) != repr(expected) for other in results[1:]):
+                    mismatches.append((start_type, seed, name))
+    return mismatches
+
+#Function to check that the fast engine gives the same results with every FEL type.
+def check_fel_results(start_types=("empty", "half", "full"), seeds=(0, 1, 2), healed_patients_limit=20000, home_mean=100.0):
+    return check_same_results([{"engine": "fast", "fel": fel} for fel in FEL_TYPES], start_types, seeds, healed_patients_limit, home_mean)
+
+#Function to check that the fast engine gives the same results as the classic engine with every retention mode of the classic engine.
+#Returns the (retention, start_type, seed, metric) tuples whose results differ.
+def check_engine_results(start_types=("empty", "half", "full"), seeds=(0, 1, 2), healed_patients_limit=20000, home_mean=100.0):
+    mismatches = []
+    for retention in ("full", "streaming"):
+        variants = [{"engine": engine, "retention": retention} for engine in ENGINES]
+        mismatches.extend((retention,) + mismatch for mismatch in check_same_results(variants, start_types, seeds, healed_patients_limit, home_mean))
+    return mismatches
+
+#Function to run the fast engine with every FEL type while the arrival rate and the mean home treatment duration (1 / mu_s) are scaled.
+#Nurses are scaled with the arrival rate so that the triage stage stays stable; the FEL is then dominated by home treatments.
+def simulation_fel_benchmark(lambdas=(1, 10, 100), home_means=(6.25, 100.0, 1000.0), healed_patients_limit=100000):
+    rows = []
+    for myLambda in lambdas:
+        for home_mean in home_means:
+            params = dict(BENCHMARK_PARAMS, myLambda=myLambda, mu_s=1 / home_mean, p1=0.8, healed_patients_limit=healed_patients_limit)
+            params["S"] = max(BENCHMARK_PARAMS["S"], int(2 * myLambda / params["mu_t"]))
+            params["K"] = max(BENCHMARK_PARAMS["K"], int(2 * myLambda * (1 - params["p1"]) / params["mu_cb"]))
+            row = {"myLambda": myLambda, "home_mean": home_mean}
+            for fel in FEL_TYPES:
+                system = HealthcareSystem(engine="fast", fel=fel, retention="streaming", **params)
+                start = time.perf_counter()
+                system.run_simulation()
+                elapsed = time.perf_counter() - start
+                row[fel] = count_events(system) / elapsed
+                row["fel_size"] = len(system.event_list)
+            rows.append(row)
+    return rows
+
+#Function to get the key of a grid point in the baseline file.
+def point_key(load, K, start_type, healed_patients_limit):
+    return "load=" + str(load) + ",K=" + str(K) + ",start_type=" + start_type + ",limit=" + str(healed_patients_limit)
+
+#Function to get the peak resident set size of the current process in MB.
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10    #Bytes on macOS, KB on Linux.
+
+#Function to run a simulation with instrumentation enabled and get its instrumentation summary.
+def instrumented_run(system):
+    system.instrumentation = Instrumentation()
+    system.run_simulation()
+    return system.get_instrumentation_summary()
+
+#Function to measure one grid point of the suite. Runs in its own process, so the peak RSS belongs to this point only.
+#Events per second come from a plain run_simulation, ns per event type from a second, instrumented run with the same seed.
+#(both runs execute the same events, the instrumented run counts them)
+def run_suite_point(point):
+    load, K, start_type, healed_patients_limit, engine, retention = point
+    params = dict(BENCHMARK_PARAMS, K=K, start_type=start_type, healed_patients_limit=healed_patients_limit)
+    params["myLambda"] = load * params["S"] * params["mu_t"]
+    system = HealthcareSystem(engine=engine, retention=retention, **params)
+    start = time.perf_counter()
+    system.run_simulation()
+    elapsed = time.perf_counter() - start
+    result = {"seconds": elapsed, "peak_rss_mb": peak_rss_mb()}
+    del system
+    summary = instrumented_run(HealthcareSystem(engine=engine, retention=retention, **params))
+    result["events"] = summary["total_events"]
+    result["events_per_second"] = result["events"] / elapsed
+    result["ns_per_event"] = {event_type: row["mean_ns"] for event_type, row in summary["events"].items()}
+    return result
+
+#Function to run the benchmark suite over the grid. Every point is run in a fresh process.
+def run_suite(grid=SUITE_GRID, engine="fast", retention="streaming"):
+    points = [(load, K, start_type, limit, engine, retention) for limit in grid["healed_patients_limit"] for load in grid["load"]
+              for K in grid["K"] for start_type in grid["start_type"]]
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for point, result in zip(points, pool.imap(run_suite_point, points)):
+            results[point_key(*point[:4])] = result
+    return {"version": BASELINE_VERSION, "engine": engine, "retention": retention, "points": results}
+
+#Function to compare suite results with a baseline. A point regresses if its events per second drop, or its peak RSS grows,
+#by more than tolerance (relative). Returns a list of (key, metric, baseline value, current value).
+#Raises ValueError if the baseline has another file version, engine or retention mode than the results.
+def find_regressions(results, baseline, tolerance=0.1):
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError("baseline file version " + repr(baseline.get("version")) + " is not supported, expected " + str(BASELINE_VERSION))
+    for name in ("engine", "retention"):
+        if baseline.get(name) != results[name]:
+            raise ValueError("baseline " + name + " " + repr(baseline.get(name)) + " does not match the current run (" + repr(results[name]) + ")")
+    regressions = []
+    for key, current in results["points"].items():
+        previous = baseline["points"].get(key)
+        if previous is None:
+            continue
+        if current["events_per_second"] < previous["events_per_second"] * (1 - tolerance):
+            regressions.append((key, "events_per_second", previous["events_per_second"], current["events_per_second"]))
+        if current["peak_rss_mb"] > previous["peak_rss_mb"] * (1 + tolerance):
+            regressions.append((key, "peak_rss_mb", previous["peak_rss_mb"], current["peak_rss_mb"]))
+    return regressions
+
+#Function to print the results of the benchmark suite.
+def print_suite(results):
+    print("point".ljust(50) + "events/s".rjust(12) + "".join(("ns " + event_type).rjust(24) for event_type in EVENT_TYPES) + "peak RSS MB".rjust(14))
+    for key, result in results["points"].items():
+        row = key.ljust(50) + ("%.0f" % result["events_per_second"]).rjust(12)
+        row += "".join(("%.0f" % result["ns_per_event"][event_type]).rjust(24) for event_type in EVENT_TYPES)
+        print(row + ("%.1f" % result["peak_rss_mb"]).rjust(14))
+
+#Function to print the results of the FEL benchmarks.
+def print_fel_benchmark(crossover_rows, crossover, simulation_rows):
+    print("Hold model: ns per hold operation")
+    print("size".rjust(10) + "".join(fel.rjust(12) for fel in FEL_TYPES))
+    for row in crossover_rows:
+        print(str(row["size"]).rjust(10) + "".join(("%.0f" % row[fel]).rjust(12) for fel in FEL_TYPES))
+    print("Crossover size: " + str(crossover))
+    print("--")
+    print("Fast engine: events per second")
+    print("lambda".rjust(8) + "1/mu_s".rjust(10) + "FEL size".rjust(10) + "".join(fel.rjust(12) for fel in FEL_TYPES))
+    for row in simulation_rows:
+        print(str(row["myLambda"]).rjust(8) + str(row["home_mean"]).rjust(10) + str(row["fel_size"]).rjust(10) + "".join(("%.0f" % row[fel]).rjust(12) for fel in FEL_TYPES))
+
+#Command line entry point of the benchmarks.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the healthcare system simulation.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    fel_parser = subparsers.add_parser("fel", help="compare the future event list implementations")
+    fel_parser.add_argument("--sizes", type=int, nargs="+", default=[10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6], help="FEL sizes of the hold model")
+    fel_parser.add_argument("--operations", type=int, default=200000, help="hold operations per size")
+    fel_parser.add_argument("--lambdas", type=float, nargs="+", default=[1, 10, 100], help="arrival rates of the simulation runs")
+    fel_parser.add_argument("--home_means", type=float, nargs="+", default=[6.25, 100.0, 1000.0], help="mean home treatment durations of the simulation runs")
+    fel_parser.add_argument("--limit", type=int, default=100000, help="healed patients of the simulation runs")
+    check_parser = subparsers.add_parser("check", help="check that every FEL type and engine gives the same results")
+    check_parser.add_argument("--operations", type=int, default=200000, help="push and pop operations of the order check")
+    check_parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2], help="seeds of the order check and of the simulation runs")
+    check_parser.add_argument("--limit", type=int, default=20000, help="healed patients of the simulation runs")
+    suite_parser = subparsers.add_parser("suite", help="run the benchmark suite and check for regressions")
+    suite_parser.add_argument("--loads", type=float, nargs="+", default=list(SUITE_GRID["load"]), help="load factors myLambda / (S * mu_t)")
+    suite_parser.add_argument("--K", type=int, nargs="+", default=list(SUITE_GRID["K"]), help="numbers of beds")
+    suite_parser.add_argument("--start_types", nargs="+", choices=("empty", "half", "full"), default=list(SUITE_GRID["start_type"]), help="start conditions")
+    suite_parser.add_argument("--limits", type=int, nargs="+", default=list(SUITE_GRID["healed_patients_limit"]), help="healed patient limits")
+    suite_parser.add_argument("--engine", choices=ENGINES, default="fast", help="simulation engine")
+    suite_parser.add_argument("--retention", choices=RETENTION_MODES, default="streaming", help="retention mode")
+    suite_parser.add_argument("--save", help="write the results as the new baseline file")
+    suite_parser.add_argument("--compare", help="baseline file to check the results against")
+    suite_parser.add_argument("--tolerance", type=float, default=0.1, help="relative tolerance of the regression check")
+    arguments = parser.parse_args(argv)
+    if arguments.command == "fel":
+        rows, crossover = fel_crossover(arguments.sizes, arguments.operations)
+        simulation_rows = simulation_fel_benchmark(arguments.lambdas, arguments.home_means, arguments.limit)
+        print_fel_benchmark(rows, crossover, simulation_rows)
+    elif arguments.command == "check":
+        failed = False
+        for seed in arguments.seeds:
+            index = check_fel_order(arguments.operations, seed)
+            if index is not None:
+                print("ORDER MISMATCH seed " + str(seed) + " at pop " + str(index))
+                failed = True
+        for start_type, seed, name in check_fel_results(seeds=arguments.seeds, healed_patients_limit=arguments.limit):
+            print("RESULT MISMATCH " + start_type + " seed " + str(seed) + " " + name)
+            failed = True
+        for retention, start_type, seed, name in check_engine_results(seeds=arguments.seeds, healed_patients_limit=arguments.limit):
+            print("ENGINE MISMATCH " + retention + " " + start_type + " seed " + str(seed) + " " + name)
+            failed = True
+        print("Check " + ("failed" if failed else "passed") + ": FEL types " + ", ".join(FEL_TYPES) + ", engines " + ", ".join(ENGINES))
+        if failed:
+            return 1
+    elif arguments.command == "suite":
+        grid = {"load": arguments.loads, "K": arguments.K, "start_type": arguments.start_types, "healed_patients_limit": arguments.limits}
+        results = run_suite(grid, arguments.engine, arguments.retention)
+        print_suite(results)
+        if arguments.save:
+            with open(arguments.save, "w") as file:
+                json.dump(results, file, indent=2)
+        if arguments.compare:
+            with open(arguments.compare) as file:
+                regressions = find_regressions(results, json.load(file), arguments.tolerance)
+            for key, metric, previous, current in regressions:
+                print("REGRESSION " + key + " " + metric + ": " + str(previous) + " -> " + str(current))
+            if regressions:
+                return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
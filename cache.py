@@ -0,0 +1,149 @@
+import hashlib
+import inspect
+import json
+import os
+from collections import OrderedDict
+import numpy as np
+import replication
+import src
+from src import HealthcareSystem, DEFAULT_SEED
+from replication import run_replications, summarize
+
+#Modules whose code determines the results. A change in any of them changes CODE_VERSION and invalidates the cache.
+VERSIONED_MODULES = (src, replication)
+#Parameters of HealthcareSystem that do not change the results, they are not part of the cache key.
+UNKEYED_PARAMS = ("self", "trace", "instrumentation", "block_size")
+
+#Function to calculate the version of the simulator code as a hash of the source files of VERSIONED_MODULES.
+def code_version():
+    digest = hashlib.sha256()
+    for module in VERSIONED_MODULES:
+        with open(module.__file__, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+CODE_VERSION = code_version()
+
+#Function to convert a seed (int or numpy SeedSequence) to a JSON value.
+def canonical_seed(seed):
+    if isinstance(seed, np.random.SeedSequence):
+        return {"entropy": seed.entropy, "spawn_key": list(seed.spawn_key), "pool_size": seed.pool_size}
+    return int(seed)
+
+#Function to calculate the cache key of a query: hash of the canonical JSON of the HealthcareSystem parameters with their
+#defaults filled in, the seed, the kind of query and CODE_VERSION. Equal queries always have the same key.
+def cache_key(kind, params, seed):
+    arguments = inspect.signature(HealthcareSystem.__init__).bind(None, **params)
+    arguments.apply_defaults()
+    keyed = {name: value for name, value in arguments.arguments.items() if name not in UNKEYED_PARAMS and name != "seed"}
+    text = json.dumps({"kind": kind, "params": keyed, "seed": canonical_seed(seed), "version": CODE_VERSION}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+#Class representing a memoised cache of simulation results with two tiers:
+#   memory: LRU dictionary of at most memory_entries entries,
+#   disk: one JSON file per entry in directory, the least recently used files are removed when the directory exceeds disk_bytes.
+#File names start with CODE_VERSION; files of other code versions are removed when the cache is opened.
+#Entries of replications are lists of get_results dictionaries in replication order, so more replications are appended.
+class ResultCache:
+    def __init__(self, directory=".result_cache", memory_entries=256, disk_bytes=64 * 2 ** 20):
+        self.directory = directory                  #Directory of the disk tier. (None for a memory-only cache)
+        self.memory_entries = memory_entries        #Largest number of entries of the memory tier.
+        self.disk_bytes = disk_bytes                #Largest total size of the files of the disk tier.
+        self.memory = OrderedDict()                 #Memory tier, most recently used entry last.
+        self.hits = 0                               #Number of queries answered from the cache.
+        self.misses = 0                             #Number of queries that ran the simulation. (also partially)
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            for name in os.listdir(directory):
+                if name.endswith(".json") and not name.startswith(CODE_VERSION + "-"):
+                    os.remove(os.path.join(directory, name))
+
+    #Function to get the path of the disk tier file of a key.
+    def path(self, key):
+        return os.path.join(self.directory, CODE_VERSION + "-" + key + ".json")
+
+    #Function to get the entry of a key from the memory tier, then from the disk tier. Returns None if the key is not cached.
+    def get(self, key):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if self.directory is None:
+            return None
+        path = self.path(key)
+        try:
+            with open(path) as file:
+                value = json.load(file)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)      #Access time of the entry for the LRU eviction of the disk tier.
+        self.remember(key, value)
+        return value
+
+    #Function to store the entry of a key in both tiers.
+    def put(self, key, value):
+        self.remember(key, value)
+        if self.directory is None:
+            return
+        path = self.path(key)
+        with open(path + ".tmp", "w") as file:
+            json.dump(value, file)
+        os.replace(path + ".tmp", path)
+        self.evict()
+
+    #Function to add an entry to the memory tier, removing the least recently used entry if it is full.
+    def remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    #Function to remove the least recently used files of the disk tier until their total size is at most disk_bytes.
+    def evict(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                path = os.path.join(self.directory, name)
+                status = os.stat(path)
+                files.append((status.st_mtime, status.st_size, path))
+        total = sum(file[1] for file in files)
+        for modified, size, path in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    #Function to remove every entry of both tiers.
+    def clear(self):
+        self.memory.clear()
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, name))
+
+    #Function to get the results (see HealthcareSystem.get_results) of one simulation run with the given seed.
+    def run(self, params, seed=DEFAULT_SEED):
+        key = cache_key("run", params, seed)
+        results = self.get(key)
+        if results is not None:
+            self.hits += 1
+            return results
+        self.misses += 1
+        system = HealthcareSystem(seed=seed, **params)
+        system.run_simulation()
+        results = system.get_results()
+        self.put(key, results)
+        return results
+
+    #Function to get R replications of the simulation model, the same as replication.run_replications.
+    #If fewer replications are cached for the query, only the missing ones are run and appended to the entry.
+    def replications(self, params, replications, seed=DEFAULT_SEED, workers=None, confidence=0.95):
+        key = cache_key("replications", params, seed)
+        results = self.get(key) or []
+        if len(results) >= replications:
+            self.hits += 1
+        else:
+            self.misses += 1
+            results = results + run_replications(params, replications - len(results), seed, workers, confidence, first=len(results))["replications"]
+            self.put(key, results)
+        results = results[:replications]
+        return {"replications": results, "summary": summarize(results, confidence)}
@@ -0,0 +1,93 @@
+import argparse
+import os
+import pickle
+from src import HealthcareSystem, DEFAULT_SEED, RESULT_LABELS, STATE_VERSION
+from replication import DEFAULT_PARAMS
+
+CHECKPOINT_MAGIC = b"HCSSTATE"     #First bytes of every checkpoint file, followed by the pickled simulation state.
+
+#Function to write the state of a simulation (see HealthcareSystem.get_state) to a checkpoint file.
+#The file is written next to path and then renamed, so a crash while writing never leaves a partial checkpoint behind.
+def save_checkpoint(system, path):
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(CHECKPOINT_MAGIC)
+        pickle.dump(system.get_state(), file, protocol=pickle.HIGHEST_PROTOCOL)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+#Function to read the simulation state of a checkpoint file. Checkpoints are pickled, only load files you trust.
+def read_checkpoint(path):
+    with open(path, "rb") as file:
+        if file.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+            raise ValueError(path + " is not a checkpoint file")
+        state = pickle.load(file)
+    if state.get("version") != STATE_VERSION:
+        raise ValueError(path + " has simulation state version " + repr(state.get("version")) + ", expected " + str(STATE_VERSION))
+    return state
+
+#Function to restore the simulation of a checkpoint file. Continue it with resume_simulation.
+def load_checkpoint(path, trace=None, instrumentation=None):
+    return HealthcareSystem.from_state(read_checkpoint(path), trace, instrumentation)
+
+#Function to create independent branches of a simulation state (e.g. a warmed-up one), one per dict of changed parameters.
+#Every branch continues from the same state with the same random stream positions (common random numbers),
+#so the branches only differ by their parameters. See HealthcareSystem.change_parameters for the parameters that can change.
+#The metrics of every branch (get_results) cover the period since the fork only.
+def fork(state, changes):
+    branches = []
+    for branch_changes in changes:
+        system = HealthcareSystem.from_state(state)
+        system.change_parameters(**branch_changes)
+        branches.append(system)
+    return branches
+
+#Function to check that a simulation state belongs to the run with the given parameters and seed.
+#Every parameter stored in the state (except healed_patients_limit) must be equal. Raises ValueError listing the differences.
+def check_checkpoint(state, params, seed, path):
+    stored = dict(state["scalars"], **state["params"])
+    mismatches = [name + "=" + repr(stored[name]) + " (requested " + repr(value) + ")" for name, value in dict(params, seed=seed).items()
+                  if name in stored and name != "healed_patients_limit" and stored[name] != value]
+    if mismatches:
+        raise ValueError(path + " is a checkpoint of another run: " + ", ".join(mismatches))
+
+#Function to run a simulation that writes a checkpoint to path every interval healed patients.
+#If the checkpoint file exists (e.g. after a crash), the run continues from it instead of starting again; it must be a
+#checkpoint of the same parameters and seed. (see check_checkpoint)
+#The results are exactly the same as the results of an uninterrupted run.
+def run_with_checkpoints(params, path, interval, seed=DEFAULT_SEED):
+    limit = params["healed_patients_limit"]
+    if os.path.exists(path):
+        state = read_checkpoint(path)
+        check_checkpoint(state, params, seed, path)
+        system = HealthcareSystem.from_state(state)
+        system.healed_patients_limit = limit
+    else:
+        system = HealthcareSystem(seed=seed, **dict(params, engine="fast"))
+        system.initialize_simulation()
+    while system.healed_patients < limit:
+        system.healed_patients_limit = min(limit, system.healed_patients + interval)
+        system.resume_simulation()
+        save_checkpoint(system, path)
+    return system
+
+#Command line entry point of the checkpointed run.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the simulation with periodic checkpoints, continuing from the checkpoint if it exists.")
+    parser.add_argument("path", help="checkpoint file")
+    parser.add_argument("--interval", type=int, default=100000, help="number of healed patients between checkpoints")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed of the run")
+    parser.add_argument("--limit", type=int, default=1000000, help="number of healed patients to stop the simulation")
+    parser.add_argument("--start_type", choices=("empty", "half", "full"), default=DEFAULT_PARAMS["start_type"], help="start condition of the system")
+    arguments = parser.parse_args(argv)
+    params = dict(DEFAULT_PARAMS, healed_patients_limit=arguments.limit, start_type=arguments.start_type)
+    system = run_with_checkpoints(params, arguments.path, arguments.interval, arguments.seed)
+    results = system.get_results()
+    for name, label in RESULT_LABELS.items():
+        print(label)
+        print(results[name])
+        print("--")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from src import HealthcareSystem, DEFAULT_SEED, RESULT_LABELS, ENGINES, SELECTION_POLICIES, RETENTION_MODES
+
+#Default parameters of the simulation model. (same as the ones used in src.py)
+DEFAULT_PARAMS = {
+    "S": 4,
+    "K": 7,
+    "mu_t": 0.357142857,
+    "mu_cb": 0.142857143,
+    "mu_s": 0.16,
+    "myLambda": 1,
+    "p1": 0.2,
+    "healed_patients_limit": 20,
+    "start_type": "empty",
+    "engine": "fast",
+    "nurse_policy": "longest_idle",
+    "bed_policy": "longest_idle",
+    "retention": "streaming",
+}
+
+#Function to calculate the continued fraction used in the regularized incomplete beta function. (Lentz's method)
+def _beta_continued_fraction(a, b, x):
+    tiny = 1e-300
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1.0)
+    if abs(d) < tiny:
+        d = tiny
+    d = 1.0 / d
+    h = d
+    for m in range(1, 300):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((a + m2 - 1.0) * (a + m2))
+        d = 1.0 + aa * d
+        if abs(d) < tiny:
+            d = tiny
+        c = 1.0 + aa / c
+        if abs(c) < tiny:
+            c = tiny
+        d = 1.0 / d
+        h *= d * c
+        aa = -(a + m) * (a + b + m) * x / ((a + m2) * (a + m2 + 1.0))
+        d = 1.0 + aa * d
+        if abs(d) < tiny:
+            d = tiny
+        c = 1.0 + aa / c
+        if abs(c) < tiny:
+            c = tiny
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 1e-15:
+            break
+    return h
+
+#Function to calculate the regularized incomplete beta function I_x(a, b).
+def _regularized_beta(a, b, x):
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    log_front = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1.0 - x)
+    if x < (a + 1.0) / (a + b + 2.0):
+        return math.exp(log_front) * _beta_continued_fraction(a, b, x) / a
+    return 1.0 - math.exp(log_front) * _beta_continued_fraction(b, a, 1.0 - x) / b
+
+#Function to calculate the cumulative distribution function of Student's t distribution with df degrees of freedom.
+def t_cdf(t, df):
+    tail = 0.5 * _regularized_beta(df / 2.0, 0.5, df / (df + t * t))
+    return 1.0 - tail if t > 0 else tail
+
+#Function to calculate the quantile of Student's t distribution with df degrees of freedom. (bisection on t_cdf)
+def t_quantile(p, df):
+    if p == 0.5:
+        return 0.0
+    if p < 0.5:
+        return -t_quantile(1.0 - p, df)
+    low = 0.0
+    high = 1.0
+    while t_cdf(high, df) < p:
+        high *= 2.0
+    for _ in range(200):
+        middle = (low + high) / 2.0
+        if t_cdf(middle, df) < p:
+            low = middle
+        else:
+            high = middle
+        if high - low < 1e-12 * max(1.0, high):
+            break
+    return (low + high) / 2.0
+
+#Function to calculate mean, variance and t-based confidence interval of the given observations.
+#Observations that are nan (metric undefined in that replication) are left out.
+def confidence_interval(values, confidence=0.95):
+    values = [value for value in values if not math.isnan(value)]
+    n = len(values)
+    mean = math.fsum(values) / n if n > 0 else math.nan
+    if n > 1:
+        variance = math.fsum((value - mean) ** 2 for value in values) / (n - 1)
+        half_width = t_quantile(1.0 - (1.0 - confidence) / 2.0, n - 1) * math.sqrt(variance / n)
+    else:
+        variance = math.nan
+        half_width = math.nan
+    return {"n": n, "mean": mean, "variance": variance, "half_width": half_width, "lower": mean - half_width, "upper": mean + half_width}
+
+#Function to calculate the confidence intervals of every metric in RESULT_LABELS over a list of replication results.
+def summarize(replications, confidence=0.95):
+    summary = {}
+    for name in RESULT_LABELS:
+        summary[name] = confidence_interval([result[name] for result in replications], confidence)
+    return summary
+
+#Function to run a single replication. Defined at module level so that it can be sent to the worker processes.
+def run_replication(params, seed):
+    system = HealthcareSystem(seed=seed, **params)
+    system.run_simulation()
+    return system.get_results()
+
+#Function to create R statistically independent seeds from a root seed.
+def spawn_seeds(seed, replications):
+    return np.random.SeedSequence(seed).spawn(replications)
+
+#Function to run R independent replications of the simulation model in a process pool and aggregate their results.
+#Replication i is always driven by the i-th spawned seed and results are collected in replication order,
+#so the output is exactly the same for any number of workers. first skips the first replications, so that more
+#replications can be added to existing ones. (the summary is of the new replications only)
+def run_replications(params, replications, seed=DEFAULT_SEED, workers=None, confidence=0.95, first=0):
+    seeds = spawn_seeds(seed, first + replications)[first:]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or replications <= 1:
+        results = [run_replication(params, child) for child in seeds]
+    else:
+        chunksize = max(1, replications // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run_replication, [params] * replications, seeds, chunksize=chunksize))
+    return {"replications": results, "summary": summarize(results, confidence)}
+
+#Function to parse the command line arguments of the replication engine.
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Run independent replications of the healthcare system simulation.")
+    parser.add_argument("-R", "--replications", type=int, default=100, help="number of independent replications")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="root seed of the replications")
+    parser.add_argument("--confidence", type=float, default=0.95, help="confidence level of the intervals")
+    parser.add_argument("--S", type=int, default=DEFAULT_PARAMS["S"], help="number of triage nurses")
+    parser.add_argument("--K", type=int, default=DEFAULT_PARAMS["K"], help="number of hospital beds")
+    parser.add_argument("--mu_t", type=float, default=DEFAULT_PARAMS["mu_t"], help="triage service rate")
+    parser.add_argument("--mu_cb", type=float, default=DEFAULT_PARAMS["mu_cb"], help="hospital healing rate")
+    parser.add_argument("--mu_s", type=float, default=DEFAULT_PARAMS["mu_s"], help="home healing rate of stable patients")
+    parser.add_argument("--myLambda", type=float, default=DEFAULT_PARAMS["myLambda"], help="arrival rate")
+    parser.add_argument("--p1", type=float, default=DEFAULT_PARAMS["p1"], help="probability of stable condition")
+    parser.add_argument("--limit", type=int, default=DEFAULT_PARAMS["healed_patients_limit"], help="number of healed patients to stop the simulation")
+    parser.add_argument("--start_type", choices=("empty", "half", "full"), default=DEFAULT_PARAMS["start_type"], help="start condition of the system")
+    parser.add_argument("--engine", choices=ENGINES, default=DEFAULT_PARAMS["engine"], help="simulation engine")
+    parser.add_argument("--nurse_policy", choices=SELECTION_POLICIES, default=DEFAULT_PARAMS["nurse_policy"], help="selection policy for idle nurses")
+    parser.add_argument("--bed_policy", choices=SELECTION_POLICIES, default=DEFAULT_PARAMS["bed_policy"], help="selection policy for idle beds")
+    parser.add_argument("--retention", choices=RETENTION_MODES, default=DEFAULT_PARAMS["retention"], help="keep every record (full) or only online statistics (streaming)")
+    return parser.parse_args(argv)
+
+#Function to build the parameters of HealthcareSystem from the parsed command line arguments.
+def params_from_arguments(arguments):
+    return {
+        "S": arguments.S,
+        "K": arguments.K,
+        "mu_t": arguments.mu_t,
+        "mu_cb": arguments.mu_cb,
+        "mu_s": arguments.mu_s,
+        "myLambda": arguments.myLambda,
+        "p1": arguments.p1,
+        "healed_patients_limit": arguments.limit,
+        "start_type": arguments.start_type,
+        "engine": arguments.engine,
+        "nurse_policy": arguments.nurse_policy,
+        "bed_policy": arguments.bed_policy,
+        "retention": arguments.retention,
+    }
+
+#Function to print the summary of the replications.
+def print_summary(summary, confidence):
+    for name, label in RESULT_LABELS.items():
+        row = summary[name]
+        print(label)
+        print("mean: " + str(row["mean"]) + "  variance: " + str(row["variance"]) + "  n: " + str(row["n"]))
+        print(str(round(confidence * 100, 2)) + "% CI: [" + str(row["lower"]) + ", " + str(row["upper"]) + "]  half-width: " + str(row["half_width"]))
+        print("--")
+
+#Command line entry point of the replication engine.
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    output = run_replications(params_from_arguments(arguments), arguments.replications, arguments.seed, arguments.workers, arguments.confidence)
+    print_summary(output["summary"], arguments.confidence)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import argparse
+import math
+import numpy as np
+from src import HealthcareSystem, DEFAULT_SEED, RESULT_LABELS, SELECTION_POLICIES
+from replication import DEFAULT_PARAMS, confidence_interval
+
+#Metrics used to detect the end of the warm-up period: batched sojourn times and time-weighted occupancy.
+WARMUP_METRICS = ("time_to_heal", "nurse_utilization", "bed_utilization")
+
+#Number of chunks averaged into one MSER batch. (MSER-5)
+MSER_BATCH = 5
+
+#Number of last batches never truncated by MSER, their statistic is too noisy to be minimal for a real reason.
+MSER_TAIL = 5
+
+#Function to calculate the metrics of get_results over the period between two accumulator snapshots. (see HealthcareSystem.get_accumulators)
+def period_results(start, end, S, K):
+    elapsed = end["time"] - start["time"]
+    arrived_beds = end["num_patients_arrived_beds"] - start["num_patients_arrived_beds"]
+    arrived = end["num_patients_arrived"] - start["num_patients_arrived"]
+    healed = end["sojourn_count"] - start["sojourn_count"]
+    results = {}
+    results["nurse_available"] = (elapsed - (end["time_triage_full"] - start["time_triage_full"])) / elapsed
+    results["bed_available"] = (elapsed - (end["time_beds_full"] - start["time_beds_full"])) / elapsed
+    results["joint"] = results["bed_available"] * results["nurse_available"]
+    results["bed_rejection_ratio"] = (end["num_patients_rejected_beds"] - start["num_patients_rejected_beds"]) / arrived_beds if arrived_beds > 0 else math.nan
+    results["nurse_utilization"] = (end["worked_time"] - start["worked_time"]) / (S * elapsed) if S > 0 else math.nan
+    results["bed_utilization"] = (end["occupied_time"] - start["occupied_time"]) / (K * elapsed) if K > 0 else math.nan
+    results["home_treated_fraction"] = (end["treated_home"] - start["treated_home"]) / arrived if arrived > 0 else math.nan
+    results["time_to_heal"] = (end["sojourn_sum"] - start["sojourn_sum"]) / healed if healed > 0 else math.nan
+    return results
+
+#Function to find the MSER truncation point of a series of batch means.
+#MSER(d) = sum_{i>=d} (Y_i - mean_d)^2 / (m - d)^2 is minimized over d <= m - MSER_TAIL. Returns (d*, m).
+#The caller decides whether d* is acceptable: a d* in the second half means the warm-up is not over yet.
+def mser_truncation(values):
+    values = np.asarray(values, dtype=float)
+    m = len(values)
+    if m < 2:
+        return 0, m
+    tail_sum = np.cumsum(values[::-1])[::-1]
+    tail_square_sum = np.cumsum((values * values)[::-1])[::-1]
+    counts = np.arange(m, 0, -1, dtype=float)
+    statistic = (tail_square_sum - tail_sum * tail_sum / counts) / (counts * counts)
+    return int(np.argmin(statistic[:max(1, m - MSER_TAIL + 1)])), m
+
+#Function to merge neighboring batches into batches of twice the size. If the number of batches is odd, the last batch
+#is dropped and its chunks are counted as pending. Returns the new boundaries, batch size and pending chunks.
+def merge_batches(boundaries, batch_size, pending):
+    if (len(boundaries) - 1) % 2 == 1:
+        boundaries = boundaries[:-1]
+        pending += batch_size
+    return boundaries[::2], 2 * batch_size, pending
+
+#Function to run one long simulation that detects the end of its warm-up period online and stops as soon as every requested
+#metric reaches its target relative precision.
+#   The simulation is advanced in chunks of chunk_size healed patients and accumulator snapshots are taken between chunks.
+#   Warm-up: MSER-5 on the WARMUP_METRICS, every MSER_BATCH chunks form a batch. The warm-up is over once at least
+#   min_warmup_batches batches are observed and the truncation point d* of every series is in the first half of them,
+#   otherwise the run continues chunk by chunk.
+#   Measuring from the snapshot at d* is the same as resetting the accumulators at that point.
+#   Batch means: the run after d* is split into batches of equal length (in chunks), the number of batches is kept between
+#   max_batches / 2 and max_batches by merging neighboring batches. The run stops when there are at least min_batches batches
+#   and the t-based half-width of every metric is at most relative_precision * |mean|.
+#   relative_precision is a number or a dict of metric name to target.
+#   The run also stops (converged False) when max_healed patients are healed.
+def run_sequential(params, seed=DEFAULT_SEED, metrics=None, relative_precision=0.05, confidence=0.95, chunk_size=50,
+                   min_warmup_batches=20, min_batches=20, max_batches=64, max_healed=10000000):
+    if metrics is None:
+        metrics = list(RESULT_LABELS)
+    if isinstance(relative_precision, dict):
+        targets = {name: relative_precision[name] for name in metrics}
+    else:
+        targets = {name: relative_precision for name in metrics}
+    params = dict(params, engine="fast", retention="streaming", healed_patients_limit=0)
+    S = params["S"]
+    K = params["K"]
+    system = HealthcareSystem(seed=seed, **params)
+    system.initialize_simulation()
+
+    def advance():
+        system.healed_patients_limit += chunk_size
+        system.resume_simulation()
+        return system.get_accumulators()
+
+    #Warm-up detection.
+    snapshots = [system.get_accumulators(), advance()]
+    warmup_metrics = [name for name in WARMUP_METRICS if not math.isnan(period_results(snapshots[0], snapshots[1], S, K)[name])]
+    while True:
+        while len(snapshots) < MSER_BATCH * (min_warmup_batches + 1) or (len(snapshots) - 1) % MSER_BATCH != 0:
+            snapshots.append(advance())
+        boundaries = snapshots[::MSER_BATCH]
+        truncation = 0
+        accepted = True
+        for name in warmup_metrics:
+            d, m = mser_truncation([period_results(boundaries[i], boundaries[i + 1], S, K)[name] for i in range(len(boundaries) - 1)])
+            truncation = max(truncation, d)
+            accepted = accepted and d < m / 2
+        if accepted or system.healed_patients >= max_healed:
+            break
+        snapshots.append(advance())
+    warmup_end = boundaries[truncation]
+    warmup_healed = system.healed_patients - (len(snapshots) - 1 - MSER_BATCH * truncation) * chunk_size
+
+    #Batch means, starting with the chunks observed after the truncation point.
+    #pending is the number of chunks run since the last batch boundary.
+    batch_boundaries = snapshots[MSER_BATCH * truncation:]
+    del snapshots
+    batch_size = 1
+    pending = 0
+    while len(batch_boundaries) - 1 > max_batches:
+        batch_boundaries, batch_size, pending = merge_batches(batch_boundaries, batch_size, pending)
+    converged = False
+    while True:
+        batches = [period_results(batch_boundaries[i], batch_boundaries[i + 1], S, K) for i in range(len(batch_boundaries) - 1)]
+        summary = {name: confidence_interval([batch[name] for batch in batches], confidence) for name in metrics}
+        if len(batches) >= min_batches and all(summary[name]["half_width"] <= targets[name] * abs(summary[name]["mean"]) for name in metrics):
+            converged = True
+            break
+        if system.healed_patients >= max_healed:
+            break
+        while True:
+            accumulators = advance()
+            pending += 1
+            if pending == batch_size:
+                break
+        batch_boundaries.append(accumulators)
+        pending = 0
+        if len(batch_boundaries) - 1 > max_batches:
+            batch_boundaries, batch_size, pending = merge_batches(batch_boundaries, batch_size, pending)
+
+    estimates = period_results(warmup_end, batch_boundaries[-1], S, K)
+    return {"estimates": {name: estimates[name] for name in metrics},
+            "summary": summary,
+            "converged": converged,
+            "warmup_batches": truncation,
+            "warmup_time": warmup_end["time"],
+            "warmup_healed": warmup_healed,
+            "batches": len(batches),
+            "batch_size": batch_size * chunk_size,
+            "healed_patients": system.healed_patients,
+            "events": system.sequence - len(system.event_list) + 1}
+
+#Command line entry point of the sequential run mode.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the simulation until every metric reaches the target relative precision.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed of the run")
+    parser.add_argument("--precision", type=float, default=0.05, help="target relative half-width of the confidence intervals")
+    parser.add_argument("--confidence", type=float, default=0.95, help="confidence level of the intervals")
+    parser.add_argument("--metrics", nargs="+", choices=tuple(RESULT_LABELS), default=None, help="metrics to estimate (default: all)")
+    parser.add_argument("--chunk", type=int, default=50, help="number of healed patients between accumulator snapshots")
+    parser.add_argument("--max_healed", type=int, default=10000000, help="number of healed patients to give up")
+    parser.add_argument("--S", type=int, default=DEFAULT_PARAMS["S"], help="number of triage nurses")
+    parser.add_argument("--K", type=int, default=DEFAULT_PARAMS["K"], help="number of hospital beds")
+    parser.add_argument("--mu_t", type=float, default=DEFAULT_PARAMS["mu_t"], help="triage service rate")
+    parser.add_argument("--mu_cb", type=float, default=DEFAULT_PARAMS["mu_cb"], help="hospital healing rate")
+    parser.add_argument("--mu_s", type=float, default=DEFAULT_PARAMS["mu_s"], help="home healing rate of stable patients")
+    parser.add_argument("--myLambda", type=float, default=DEFAULT_PARAMS["myLambda"], help="arrival rate")
+    parser.add_argument("--p1", type=float, default=DEFAULT_PARAMS["p1"], help="probability of stable condition")
+    parser.add_argument("--start_type", choices=("empty", "half", "full"), default=DEFAULT_PARAMS["start_type"], help="start condition of the system")
+    parser.add_argument("--nurse_policy", choices=SELECTION_POLICIES, default=DEFAULT_PARAMS["nurse_policy"], help="selection policy for idle nurses")
+    parser.add_argument("--bed_policy", choices=SELECTION_POLICIES, default=DEFAULT_PARAMS["bed_policy"], help="selection policy for idle beds")
+    arguments = parser.parse_args(argv)
+    params = {name: getattr(arguments, name) for name in ("S", "K", "mu_t", "mu_cb", "mu_s", "myLambda", "p1", "start_type", "nurse_policy", "bed_policy")}
+    output = run_sequential(params, arguments.seed, arguments.metrics, arguments.precision, arguments.confidence, arguments.chunk, max_healed=arguments.max_healed)
+    for name, row in output["summary"].items():
+        print(RESULT_LABELS[name])
+        print("estimate: " + str(output["estimates"][name]) + "  batch means: " + str(row["mean"]) + " +- " + str(row["half_width"]))
+        print("--")
+    print("Converged: " + str(output["converged"]) + ", warm-up: " + str(output["warmup_healed"]) + " healed patients (time " + str(round(output["warmup_time"], 3)) + ")")
+    print(str(output["batches"]) + " batches of " + str(output["batch_size"]) + " healed patients, " + str(output["healed_patients"]) + " healed patients, " + str(output["events"]) + " events")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,72 @@
 import heapq
-import random
+import os
+import time
+from bisect import insort
+from collections import deque
+from functools import partial
+from operator import attrgetter
 import numpy as np
 import math
 #import pandas as pd
 import statistics as stat
-random.seed(2019400033 + 2020400078) #Seeds are calculated with addition of student ID's.
-np.random.seed(2019400033 + 2020400078)
+
+DEFAULT_SEED = 2019400033 + 2020400078  #Seeds are calculated with addition of student ID's.
+STREAM_NAMES = ("arrivals", "triage", "bed", "home_stable", "home_critical", "routing")   #One independent random stream per process.
+#Output metrics of a simulation run with their descriptions, in the order they are printed.
+RESULT_LABELS = {
+    "nurse_available": "Long-run probability of arriving patient finds an available nurse",
+    "bed_available": "Long-run probability of critical patient finds an available bed",
+    "joint": "Joint",
+    "bed_rejection_ratio": "Average number of people rejected due to bed unavailability",
+    "nurse_utilization": "Average utilization of each nurse",
+    "bed_utilization": "Average number of occupied beds",
+    "home_treated_fraction": "Average number of patients treated at home",
+    "time_to_heal": "Average time a sick person gets better",
+}
+#Integer event codes used by the fast engine. EVENT_TYPES maps a code to the event type name used by the classic engine.
+ARRIVAL = 0
+DEPARTURE_TRIAGE = 1
+TREATED_AT_HOME = 2
+TREATED_AT_HOSPITAL = 3
+EVENT_TYPES = ("Arrival", "Departure_Triage", "Treated_at_Home", "Treated_at_Hospital")
+EVENT_CODES = {event_type: code for code, event_type in enumerate(EVENT_TYPES)}
+ENGINES = ("classic", "fast")   #classic: Event objects and if/elif dispatch, fast: tuple events and table dispatch.
+FEL_TYPES = ("heap", "calendar")    #Future event list implementations of the fast engine.
+#Selection policies for idle nurses and beds. longest_idle is the FIFO discipline of the original model.
+SELECTION_POLICIES = ("longest_idle", "most_recent", "least_utilized", "lowest_id")
+#Retention modes for patients and sampled variates. full: keep every record in lists, streaming: only keep online statistics,
+#columnar: keep every patient in a PatientStore and online statistics of the variates. (fast engine only)
+RETENTION_MODES = ("full", "streaming", "columnar")
+#Routes of a patient after triage, stored as int8 codes in PatientStore.route. (-1: not triaged yet)
+ROUTE_HOME_STABLE = 0
+ROUTE_HOME_CRITICAL = 1
+ROUTE_BED = 2
+ROUTE_NAMES = ("home_stable", "home_critical", "bed")
+PATIENT_COLUMNS = ("enter_time", "triage_start", "triage_end", "route", "exit_time")   #Columns of PatientStore.
+VARIATE_NAMES = ("interarrival", "nurse_service", "hospital_healing", "home_healing_s", "home_healing_c")   #Sampled variates summarized by get_distribution_summaries.
+SUMMARY_QUANTILES = (0.5, 0.9, 0.95, 0.99)    #Quantiles reported by get_distribution_summaries.
+STATE_NAMES = ("Lsys", "Lq", "Lt", "Lb", "Lh")  #State variables integrated over time when time_averages is enabled.
+#Fixed-width record written by EventTrace for every traced event. (state after the event is executed)
+TRACE_DTYPE = np.dtype([("event_number", "<i8"), ("time", "<f8"), ("code", "<i1"), ("patient", "<i8"), ("resource", "<i4"),
+                        ("Lsys", "<i4"), ("Lq", "<i4"), ("Lt", "<i4"), ("Lb", "<i4"), ("Lh", "<i4"), ("healed", "<i8")])
+#Fixed-width record of a future event list entry. event_number is the traced event after which the snapshot is taken.
+FEL_DTYPE = np.dtype([("event_number", "<i8"), ("time", "<f8"), ("code", "<i1"), ("patient", "<i8"), ("resource", "<i4")])
+#Fixed-width record of a fast engine event tuple, used to store the future event list in a simulation state.
+EVENT_DTYPE = np.dtype([("time", "<f8"), ("sequence", "<i8"), ("code", "<i1"), ("patient", "<i8"), ("resource", "<i4")])
+STATE_VERSION = 1   #Version of the layout of HealthcareSystem.get_state, increased whenever the layout changes.
+#Scalar attributes of HealthcareSystem stored in a simulation state.
+STATE_SCALARS = ("time", "healed_patients", "healed_patients_limit", "patient_id", "sequence", "first_arrival_id", "log_count", "Xs",
+                 "Lsys", "Lq", "Lt", "Lb", "Lh", "S", "K", "mu_t", "mu_cb", "mu_s", "myLambda", "p1",
+                 "num_patients_arrived", "num_patients_directly_triage", "num_patients_waiting_triage", "num_patients_arrived_beds",
+                 "num_patients_directly_beds", "num_patients_rejected_beds", "treated_home", "treated_hospital",
+                 "empty_check", "beds_empty_check", "time_triage_empty", "start_time_for_empty", "time_beds_empty", "start_time_for_empty_beds",
+                 "start_time_for_full_triage", "start_time_for_full_beds", "time_triage_full", "time_beds_full")
+#Parameters that can be changed in a running simulation with HealthcareSystem.change_parameters.
+CHANGEABLE_PARAMS = ("S", "K", "mu_t", "mu_cb", "mu_s", "myLambda", "p1", "healed_patients_limit")
 
 #Class representing event in the simulation model.
 class Event:
+    __slots__ = ("time", "event_type", "patient", "medical_service", "duration")
     #Constructor method
     def __init__(self, time, event_type, patient, medical_service, duration):
         self.time = time                        #Event's time
@@ -27,26 +85,619 @@ class Event:
  
 #Class representing patient in the simulation model.
 class Patient:
+    __slots__ = ("id", "enter_time", "exit_time")
     def __init__(self, id):
         self.id = id            #ID of the patient.
         self.enter_time = 0     #Time patient enters the system with Arrival event.
         self.exit_time = 0      #Time patient exits the system with  Treated_at_Home or Treated_at_Hospital.
 
+#Class representing the patients of a simulation as columns (struct of arrays) indexed by patient id, see PATIENT_COLUMNS.
+#Columns are numpy arrays that grow geometrically (capacity doubled when full), times that did not happen yet are nan.
+#A patient takes 33 bytes, and end-of-run metrics are vectorized reductions over the columns.
+class PatientStore:
+    def __init__(self, capacity=1024):
+        self.size = 0                   #Number of patients.
+        self.capacity = capacity        #Length of the column arrays.
+        self.enter_time = np.full(capacity, np.nan)     #Time the patient enters the system. (0 for patients of the initial state)
+        self.triage_start = np.full(capacity, np.nan)   #Time the triage of the patient starts.
+        self.triage_end = np.full(capacity, np.nan)     #Time the triage of the patient ends.
+        self.route = np.full(capacity, -1, dtype=np.int8)   #Route of the patient after triage. (see ROUTE_NAMES)
+        self.exit_time = np.full(capacity, np.nan)      #Time the patient is healed.
+
+    #Function to add a patient and return its index. (the patient id)
+    def add(self):
+        if self.size == self.capacity:
+            self.grow()
+        self.size += 1
+        return self.size - 1
+
+    #Function to double the capacity of the columns.
+    def grow(self):
+        capacity = 2 * self.capacity
+        for name in PATIENT_COLUMNS:
+            column = getattr(self, name)
+            grown = np.full(capacity, -1 if name == "route" else np.nan, dtype=column.dtype)
+            grown[:self.capacity] = column
+            setattr(self, name, grown)
+        self.capacity = capacity
+
+    #Function to get the columns of the patients as a dictionary of numpy views. (no copy)
+    def columns(self):
+        return {name: getattr(self, name)[:self.size] for name in PATIENT_COLUMNS}
+
+    #Function to write every column to directory/<column>.npy. The views are written directly, without copying them.
+    #Read them back with load_patient_columns, e.g. memory-mapped.
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name, column in self.columns().items():
+            np.save(os.path.join(directory, name + ".npy"), column)
+
+    #Function to get the time spent in the system by every healed patient with id >= first. (patients coming with Arrival event)
+    #If since is given, only patients healed after time since are included.
+    def sojourn_times(self, first, since=None):
+        times = self.exit_time[first:self.size] - self.enter_time[first:self.size]
+        if since is not None:
+            times = times[self.exit_time[first:self.size] > since]
+        return times[times > 0]     #nan (not healed yet) compares False.
+
+    #Function to get the state of the store as a dictionary. (see HealthcareSystem.get_state)
+    def get_state(self):
+        return {name: column.copy() for name, column in self.columns().items()}
+
+    #Function to restore a state returned by get_state.
+    def set_state(self, state):
+        self.size = len(state["route"])
+        while self.capacity < self.size:
+            self.grow()
+        for name in PATIENT_COLUMNS:
+            getattr(self, name)[:self.size] = state[name]
+
+#Function to read the columns written by PatientStore.save. mmap_mode "r" memory-maps the files instead of reading them. (see numpy.load)
+def load_patient_columns(directory, mmap_mode="r"):
+    return {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode) for name in PATIENT_COLUMNS}
+
 #Class representing triage nurse in the simulation model.
 class Nurse:
+    __slots__ = ("id", "worked_time", "service_duration")
     def __init__(self, id):
         self.id = id            #ID of the nurse.
         self.worked_time = 0    #Total utilization time of the nurse. 
+        self.service_duration = 0   #Duration of the current triage service. (used by the fast engine)
 
 #Class representing hospital bed in the simulation model.
 class Bed:
+    __slots__ = ("id", "occupied_time", "service_duration")
     def __init__(self, id):
         self.id = id            #ID of the bed.
         self.occupied_time = 0  #Total utilization time of the bed. 
+        self.service_duration = 0   #Duration of the current hospital treatment. (used by the fast engine)
+
+#Class representing a block-buffered random number stream for one process of the simulation model.
+#Uniforms are drawn from a numpy Generator block_size at a time and handed out one by one, which avoids the numpy call overhead per variate.
+#Exponentials are produced by inversion (-log(U)) from the same uniforms, so every variate of the stream is driven by exactly one uniform.
+#An antithetic stream hands out 1 - U for every uniform U of the stream with the same seed. (exact, U is a multiple of 2^-53)
+class RandomStream:
+    def __init__(self, seed_sequence, block_size=4096, antithetic=False):
+        self.generator = np.random.Generator(np.random.PCG64(seed_sequence))    #Independent generator of the stream.
+        self.block_size = block_size    #Number of uniforms drawn with each refill.
+        self.uniforms = []              #Current block of uniforms on the open interval (0, 1).
+        self.exponentials = []          #Unit exponentials calculated from the uniforms of the current block.
+        self.uniform_block = None       #Current block of uniforms as a numpy array. (used by take)
+        self.exponential_block = None   #Current block of unit exponentials as a numpy array. (used by take)
+        self.index = block_size         #Position of the next unused variate in the current block. (first call triggers a refill)
+        self.refills = 0                #Number of blocks drawn.
+        self.antithetic = antithetic    #True if 1 - U is handed out instead of U.
+
+    #Function to draw a new block of variates. Uniforms are built on the open interval (0, 1) so that log(U) is always finite.
+    def refill(self):
+        self.uniform_block = (self.generator.integers(0, 2 ** 52, size=self.block_size) + 0.5) * 2.0 ** -52
+        if self.antithetic:
+            self.uniform_block = 1.0 - self.uniform_block
+        self.exponential_block = -np.log(self.uniform_block)
+        self.uniforms = self.uniform_block.tolist()
+        self.exponentials = self.exponential_block.tolist()
+        self.index = 0
+        self.refills += 1
+
+    #Function to get the number of variates handed out by the stream. Calculated from the block position, so counting is free.
+    def draws(self):
+        if self.refills == 0:
+            return 0
+        return (self.refills - 1) * self.block_size + self.index
+
+    #Function to get the next n variates of the stream as numpy arrays (uniforms, unit exponentials).
+    #The stream is consumed exactly as n calls of uniform() or exponential() would consume it.
+    def take(self, n):
+        uniforms = []
+        exponentials = []
+        while n > 0:
+            if self.index == self.block_size:
+                self.refill()
+            count = min(n, self.block_size - self.index)
+            uniforms.append(self.uniform_block[self.index:self.index + count])
+            exponentials.append(self.exponential_block[self.index:self.index + count])
+            self.index += count
+            n -= count
+        if not uniforms:
+            return np.empty(0), np.empty(0)
+        return np.concatenate(uniforms), np.concatenate(exponentials)
+
+    #Function to get the state of the stream as a dictionary. Only the unused part of the current block is stored.
+    def get_state(self):
+        state = {"generator": self.generator.bit_generator.state, "block_size": self.block_size, "index": self.index, "refills": self.refills,
+                 "antithetic": self.antithetic}
+        state["remaining"] = self.uniform_block[self.index:].copy() if self.uniform_block is not None else None
+        return state
+
+    #Function to restore a state returned by get_state. The stream continues exactly where the saved stream was.
+    def set_state(self, state):
+        self.generator.bit_generator.state = state["generator"]
+        self.block_size = state["block_size"]
+        self.index = state["index"]
+        self.refills = state["refills"]
+        self.antithetic = state.get("antithetic", False)
+        if state["remaining"] is None:
+            self.uniform_block = None
+            self.exponential_block = None
+            self.uniforms = []
+            self.exponentials = []
+            return
+        #Used part of the block is filled with ones, it is never handed out again.
+        self.uniform_block = np.concatenate((np.ones(self.index), state["remaining"]))
+        self.exponential_block = -np.log(self.uniform_block)
+        self.uniforms = self.uniform_block.tolist()
+        self.exponentials = self.exponential_block.tolist()
+
+    #Function to get the next uniform variate of the stream.
+    def uniform(self):
+        if self.index == self.block_size:
+            self.refill()
+        value = self.uniforms[self.index]
+        self.index += 1
+        return value
+
+    #Function to get the next exponential variate of the stream with the given scale (mean).
+    def exponential(self, scale):
+        if self.index == self.block_size:
+            self.refill()
+        value = self.exponentials[self.index] * scale
+        self.index += 1
+        return value
+
+#Class representing the list of idle nurses or beds with a selection policy.
+#take() removes and returns the selected resource, release(resource) adds an idle resource. Both are O(1) or O(log n):
+#   longest_idle: deque, the resource idle for the longest time is selected. (FIFO)
+#   most_recent: list used as a stack, the most recently released resource is selected. (LIFO)
+#   least_utilized: heap keyed by total busy time (busy_attribute), ties are broken by id.
+#   lowest_id: heap keyed by id.
+#items is the underlying container, so len(items) is the number of idle resources.
+#Retired resources (see retire) are never selected again.
+class FreeList:
+    def __init__(self, policy, busy_attribute):
+        if policy not in SELECTION_POLICIES:
+            raise ValueError("policy must be one of " + str(SELECTION_POLICIES) + ", got " + repr(policy))
+        self.policy = policy
+        if policy == "longest_idle":
+            self.items = deque()
+            self.take = self.items.popleft
+            self.release = self.items.append
+        elif policy == "most_recent":
+            self.items = []
+            self.take = self.items.pop
+            self.release = self.items.append
+        else:
+            self.items = []
+            self.key = attrgetter(busy_attribute if policy == "least_utilized" else "id")
+            self.take = self.heap_take
+            self.release = self.heap_release
+        self.plain_release = self.release   #Release function of the policy, used when no busy resource is pending retirement.
+        self.retiring = 0                   #Number of busy resources retired when they are released.
+        self.retired = set()                #Ids of the retired resources.
+
+    #Function to retire count resources: idle ones at once (in take order), busy ones lazily when they are released.
+    #While resources are pending retirement release is replaced by retiring_release, so the release of the policy stays branch-free.
+    def retire(self, count):
+        while count > 0 and len(self.items) > 0:
+            self.retired.add(self.take().id)
+            count -= 1
+        if count > 0:
+            self.retiring += count
+            self.release = self.retiring_release
+
+    #Function to cancel up to count pending retirements. Returns the number of cancelled retirements.
+    def cancel_retirement(self, count):
+        cancelled = min(count, self.retiring)
+        self.set_retiring(self.retiring - cancelled)
+        return cancelled
+
+    #Function to set the number of busy resources pending retirement.
+    def set_retiring(self, count):
+        self.retiring = count
+        self.release = self.retiring_release if count > 0 else self.plain_release
+
+    #Function used as release while busy resources are pending retirement: the released resource is retired instead.
+    def retiring_release(self, resource):
+        self.retired.add(resource.id)
+        self.set_retiring(self.retiring - 1)
+
+    #Function to remove and return the idle resource with the smallest key.
+    def heap_take(self):
+        return heapq.heappop(self.items)[2]
+
+    #Function to add an idle resource to the heap. Busy time of the resource must be updated before it is released.
+    def heap_release(self, resource):
+        heapq.heappush(self.items, (self.key(resource), resource.id, resource))
+
+    def __len__(self):
+        return len(self.items)
+
+#Class representing the future event list of the fast engine as a binary heap. (heapq)
+#Every future event list has push(entry), pop(), len() and iteration over the entries in any order.
+#Entries are tuples starting with (time, sequence number), so they are totally ordered.
+class HeapEventList:
+    def __init__(self):
+        self.items = []                                 #Heap of the entries.
+        self.push = partial(heapq.heappush, self.items) #Called from C, no Python frame per push.
+        self.pop = partial(heapq.heappop, self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+#Class representing the future event list of the fast engine as a calendar queue. (Brown, 1988)
+#Entries are hashed into bucket_count buckets ("days") of width bucket_width by int(time / bucket_width), each bucket is a sorted list.
+#pop scans the days of the current "year" starting from the last dequeued day, so push and pop are amortised O(1)
+#when the bucket width matches the spacing of the events. The calendar is resized (bucket count doubled or halved,
+#width re-estimated from the earliest events) whenever the size leaves [bucket_count / 2, 2 * bucket_count].
+#Entries are dequeued in exactly the same order as HeapEventList.
+class CalendarEventList:
+    def __init__(self, bucket_count=2, bucket_width=1.0):
+        self.size = 0               #Number of entries.
+        self.minimum_buckets = bucket_count     #Bucket count is never halved below this value.
+        self.last_time = 0.0        #Time of the last dequeued entry. New entries are never earlier than this time.
+        self.setup(bucket_count, bucket_width, 0)
+
+    #Function to create empty buckets. virtual is the day number (int(time / bucket_width)) of the current day.
+    def setup(self, bucket_count, bucket_width, virtual):
+        self.buckets = [[] for _ in range(bucket_count)]
+        self.bucket_count = bucket_count
+        self.bucket_width = bucket_width
+        self.virtual = virtual
+        self.grow_threshold = 2 * bucket_count
+        self.shrink_threshold = bucket_count // 2 if bucket_count > self.minimum_buckets else -1
+
+    #Function to add an entry.
+    def push(self, entry):
+        insort(self.buckets[int(entry[0] / self.bucket_width) % self.bucket_count], entry)
+        self.size += 1
+        if self.size > self.grow_threshold:
+            self.resize(2 * self.bucket_count)
+
+    #Function to remove and return the entry with the smallest (time, sequence number).
+    def pop(self):
+        if self.size == 0:
+            raise IndexError("pop from an empty calendar queue")
+        buckets = self.buckets
+        bucket_width = self.bucket_width
+        bucket_count = self.bucket_count
+        virtual = self.virtual
+        for _ in range(bucket_count):
+            bucket = buckets[virtual % bucket_count]
+            if bucket and int(bucket[0][0] / bucket_width) <= virtual:
+                break
+            virtual += 1
+        else:
+            #No entry in the current year, jump directly to the day of the earliest entry.
+            virtual = int(min(bucket[0] for bucket in buckets if bucket)[0] / bucket_width)
+            bucket = buckets[virtual % bucket_count]
+        self.virtual = virtual
+        entry = bucket.pop(0)
+        self.last_time = entry[0]
+        self.size -= 1
+        if self.size < self.shrink_threshold:
+            self.resize(self.bucket_count // 2)
+        return entry
+
+    #Function to rebuild the calendar with the given bucket count and a bucket width estimated from the earliest entries.
+    #Width is three times the average separation of the earliest entries, ignoring separations larger than twice the average.
+    #The current day is the day of the last dequeued entry, not of the earliest pending one: entries pushed later may be
+    #earlier than every pending entry, and pop never looks at days before the current day.
+    def resize(self, bucket_count):
+        entries = [entry for bucket in self.buckets for entry in bucket]
+        bucket_width = self.bucket_width
+        sample = [entry[0] for entry in heapq.nsmallest(min(len(entries), 25), entries)]
+        if len(sample) > 1:
+            separations = [sample[i + 1] - sample[i] for i in range(len(sample) - 1)]
+            average = sum(separations) / len(separations)
+            separations = [separation for separation in separations if separation <= 2 * average]
+            if separations and sum(separations) > 0:
+                bucket_width = 3 * sum(separations) / len(separations)
+        virtual = int(self.last_time / bucket_width)
+        self.setup(bucket_count, bucket_width, virtual)
+        buckets = self.buckets
+        for entry in entries:
+            buckets[int(entry[0] / bucket_width) % bucket_count].append(entry)
+        for bucket in buckets:
+            bucket.sort()
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return (entry for bucket in self.buckets for entry in bucket)
+
+#Function to create an empty future event list of the given type. (see FEL_TYPES)
+def create_event_list(fel):
+    if fel == "heap":
+        return HeapEventList()
+    return CalendarEventList()
+
+#Class representing an online statistic of a stream of observations with bounded memory.
+#Observations are buffered and merged into the statistic buffer_size at a time with numpy:
+#   mean and variance are merged with Chan's parallel form of Welford's algorithm,
+#   quantiles are estimated with a merging t-digest (k1 scale function) holding about `compression` centroids.
+class OnlineStatistic:
+    def __init__(self, compression=100, buffer_size=4096):
+        self.compression = compression      #Number of k1 scale units, controls the number of centroids (accuracy of quantiles).
+        self.buffer_size = buffer_size      #Number of observations merged at a time.
+        self.buffer = []                    #Observations not merged yet.
+        self.count = 0                      #Number of merged observations.
+        self.mean = 0.0                     #Mean of the merged observations.
+        self.m2 = 0.0                       #Sum of squared deviations from the mean of the merged observations.
+        self.minimum = math.inf             #Smallest observation.
+        self.maximum = -math.inf            #Largest observation.
+        self.centroid_means = np.empty(0)   #Means of the t-digest centroids. (sorted)
+        self.centroid_weights = np.empty(0) #Weights of the t-digest centroids.
+
+    #Function to add an observation.
+    def add(self, value):
+        self.buffer.append(value)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    #Function to merge the buffered observations into the statistic.
+    def flush(self):
+        if not self.buffer:
+            return
+        batch = np.array(self.buffer)
+        self.buffer = []
+        n = len(batch)
+        batch_mean = float(batch.mean())
+        batch_m2 = float(((batch - batch_mean) ** 2).sum())
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.m2 += batch_m2 + delta * delta * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+        self.minimum = min(self.minimum, float(batch.min()))
+        self.maximum = max(self.maximum, float(batch.max()))
+        means = np.concatenate((self.centroid_means, batch))
+        weights = np.concatenate((self.centroid_weights, np.ones(n)))
+        order = np.argsort(means, kind="stable")
+        means = means[order]
+        weights = weights[order]
+        cumulative = np.cumsum(weights)
+        q = (cumulative - weights / 2) / cumulative[-1]
+        k = np.floor(self.compression * (np.arcsin(2 * q - 1) / np.pi + 0.5))
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(k)) + 1))
+        self.centroid_weights = np.add.reduceat(weights, starts)
+        self.centroid_means = np.add.reduceat(means * weights, starts) / self.centroid_weights
+
+    #Function to get the state of the statistic as a dictionary, including the observations not merged yet.
+    def get_state(self):
+        return {"compression": self.compression, "buffer_size": self.buffer_size, "buffer": np.array(self.buffer, dtype=float),
+                "count": self.count, "mean": self.mean, "m2": self.m2, "minimum": self.minimum, "maximum": self.maximum,
+                "centroid_means": self.centroid_means.copy(), "centroid_weights": self.centroid_weights.copy()}
+
+    #Function to restore a state returned by get_state.
+    def set_state(self, state):
+        self.compression = state["compression"]
+        self.buffer_size = state["buffer_size"]
+        self.buffer = state["buffer"].tolist()
+        self.count = state["count"]
+        self.mean = state["mean"]
+        self.m2 = state["m2"]
+        self.minimum = state["minimum"]
+        self.maximum = state["maximum"]
+        self.centroid_means = state["centroid_means"].copy()
+        self.centroid_weights = state["centroid_weights"].copy()
+
+    #Function to get the sample variance of the observations.
+    def variance(self):
+        self.flush()
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    #Function to estimate the p-quantile of the observations by interpolating between the centroids.
+    def quantile(self, p):
+        self.flush()
+        if self.count == 0:
+            return math.nan
+        cumulative = np.cumsum(self.centroid_weights)
+        positions = np.concatenate(([0.0], cumulative - self.centroid_weights / 2, [cumulative[-1]]))
+        values = np.concatenate(([self.minimum], self.centroid_means, [self.maximum]))
+        return float(np.interp(p * cumulative[-1], positions, values))
+
+    #Function to get count, mean, variance, min, max and SUMMARY_QUANTILES of the observations as a dictionary.
+    def summary(self):
+        self.flush()
+        result = {"n": self.count, "mean": self.mean if self.count > 0 else math.nan, "variance": self.variance(),
+                  "min": self.minimum if self.count > 0 else math.nan, "max": self.maximum if self.count > 0 else math.nan}
+        for p in SUMMARY_QUANTILES:
+            result["p" + str(round(p * 100))] = self.quantile(p)
+        return result
+
+#Function to calculate the same summary as OnlineStatistic.summary exactly from a list of observations.
+def exact_summary(values):
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    result = {"n": n, "mean": float(values.mean()) if n > 0 else math.nan, "variance": float(values.var(ddof=1)) if n > 1 else math.nan,
+              "min": float(values.min()) if n > 0 else math.nan, "max": float(values.max()) if n > 0 else math.nan}
+    for p in SUMMARY_QUANTILES:
+        result["p" + str(round(p * 100))] = float(np.quantile(values, p)) if n > 0 else math.nan
+    return result
+
+#Class representing a bounded event trace written to a binary file of TRACE_DTYPE records.
+#An event is traced if it is inside any of the windows: the first `first` events, every `every`-th event,
+#or events with start_time <= time <= end_time (a missing bound is unbounded). Events are numbered from 0 in execution order.
+#Future event list snapshots are only taken on request (request_fel_snapshot) and written to path + ".fel" as FEL_DTYPE records.
+#Records are buffered in a numpy structured array and written buffer_size at a time; read them back with read_trace.
+class EventTrace:
+    def __init__(self, path, first=50, every=None, start_time=None, end_time=None, buffer_size=4096):
+        self.path = path                    #Path of the trace file.
+        self.first = first or 0             #Number of events traced from the start.
+        self.every = every                  #Every every-th event is traced. (None to disable)
+        self.time_window = start_time is not None or end_time is not None     #True if a simulation time range is traced.
+        self.start_time = start_time if start_time is not None else -math.inf  #Start of the traced simulation time range.
+        self.end_time = end_time if end_time is not None else math.inf         #End of the traced simulation time range.
+        self.buffer = np.zeros(buffer_size, dtype=TRACE_DTYPE)  #Records not written yet.
+        self.buffered = 0                   #Number of records in buffer.
+        self.event_number = 0               #Number of the next event.
+        self.records = 0                    #Total number of traced events.
+        self.fel_requested = False          #True if a future event list snapshot is taken at the next traced event.
+        self.file = open(path, "wb")
+        self.fel_file = None                #File of the future event list snapshots, opened with the first snapshot.
+
+    #Function to request a snapshot of the future event list at the next traced event.
+    def request_fel_snapshot(self):
+        self.fel_requested = True
+
+    #Function called after every executed event, writes a record if the event is inside a window.
+    def record(self, system, code, patient_id, resource_id):
+        number = self.event_number
+        self.event_number += 1
+        if not (number < self.first or (self.every and number % self.every == 0) or (self.time_window and self.start_time <= system.time <= self.end_time)):
+            return
+        self.buffer[self.buffered] = (number, system.time, code, patient_id, resource_id,
+                                      system.Lsys, system.Lq, system.Lt, system.Lb, system.Lh, system.healed_patients)
+        self.buffered += 1
+        self.records += 1
+        if self.buffered == len(self.buffer):
+            self.flush()
+        if self.fel_requested:
+            self.fel_requested = False
+            snapshot = system.get_fel_snapshot()
+            snapshot["event_number"] = number
+            if self.fel_file is None:
+                self.fel_file = open(self.path + ".fel", "wb")
+            snapshot.tofile(self.fel_file)
+
+    #Function to write the buffered records to the file.
+    def flush(self):
+        self.buffer[:self.buffered].tofile(self.file)
+        self.buffered = 0
+        self.file.flush()
+        if self.fel_file is not None:
+            self.fel_file.flush()
+
+    #Function to write the buffered records and close the files.
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+        if self.fel_file is not None:
+            self.fel_file.close()
+
+#Function to read a trace file written by EventTrace as a read-only memory-mapped array of TRACE_DTYPE records.
+def read_trace(path):
+    return _read_records(path, TRACE_DTYPE)
+
+#Function to read the future event list snapshots of a trace (path of the trace file) as FEL_DTYPE records.
+def read_fel_snapshots(path):
+    return _read_records(path + ".fel", FEL_DTYPE)
+
+#Function to memory-map a file of fixed-width records. Empty files cannot be memory-mapped, an empty array is returned instead.
+def _read_records(path, dtype):
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+#Class representing opt-in instrumentation of the event handlers.
+#For every event popped from the future event list it records the count, cumulative and maximum handler wall time per event type
+#and the high-water mark of the future event list size, then calls the registered event callbacks as callback(system, code, elapsed_ns).
+#Finish callbacks are called as callback(system, summary) at the end of run_simulation. Engines use a separate instrumented loop,
+#so runs without instrumentation do not pay for it.
+class Instrumentation:
+    def __init__(self):
+        self.counts = [0] * len(EVENT_TYPES)        #Number of events per event code.
+        self.total_ns = [0] * len(EVENT_TYPES)      #Cumulative handler wall time per event code.
+        self.max_ns = [0] * len(EVENT_TYPES)        #Maximum handler wall time per event code.
+        self.fel_high_water = 0                     #Largest future event list size after an event.
+        self.event_callbacks = []                   #Functions called after every event.
+        self.finish_callbacks = []                  #Functions called with the summary at the end of the run.
+        self.start_ns = 0                           #Wall clock at the start of run_simulation.
+        self.run_ns = 0                             #Wall time of run_simulation.
+        self.summary = None                         #Summary of the last run. (see get_summary)
+
+    #Function to register a callback called after every event as callback(system, code, elapsed_ns).
+    def on_event(self, callback):
+        self.event_callbacks.append(callback)
+
+    #Function to register a callback called at the end of the run as callback(system, summary).
+    def on_finish(self, callback):
+        self.finish_callbacks.append(callback)
+
+    #Function called at the start of run_simulation.
+    def start(self):
+        self.start_ns = time.perf_counter_ns()
+
+    #Function called after every instrumented event.
+    def record(self, system, code, elapsed_ns, fel_size):
+        self.counts[code] += 1
+        self.total_ns[code] += elapsed_ns
+        if elapsed_ns > self.max_ns[code]:
+            self.max_ns[code] = elapsed_ns
+        if fel_size > self.fel_high_water:
+            self.fel_high_water = fel_size
+        for callback in self.event_callbacks:
+            callback(system, code, elapsed_ns)
+
+    #Function called at the end of run_simulation, builds the summary and calls the finish callbacks.
+    def finish(self, system):
+        self.run_ns = time.perf_counter_ns() - self.start_ns
+        self.summary = self.get_summary(system)
+        for callback in self.finish_callbacks:
+            callback(system, self.summary)
+
+    #Function to get the structured summary of the instrumentation as a dictionary.
+    def get_summary(self, system):
+        events = {}
+        for code, event_type in enumerate(EVENT_TYPES):
+            count = self.counts[code]
+            events[event_type] = {"count": count, "total_ns": self.total_ns[code], "mean_ns": self.total_ns[code] / count if count else 0.0,
+                                  "max_ns": self.max_ns[code]}
+        total = sum(self.counts)
+        return {"events": events, "total_events": total, "run_seconds": self.run_ns / 1e9,
+                "events_per_second": total / (self.run_ns / 1e9) if self.run_ns else 0.0, "fel_high_water": self.fel_high_water,
+                "rng_draws": {name: stream.draws() for name, stream in system.streams.items()}}
+
+#Function to create the independent random streams of a simulation from a single seed. (antithetic: see RandomStream)
+def create_streams(seed, block_size=4096, antithetic=False):
+    if isinstance(seed, np.random.SeedSequence):
+        #A fresh copy is spawned from, so the same SeedSequence always gives the same streams. (spawn changes its state)
+        seed_sequence = np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key, pool_size=seed.pool_size)
+    else:
+        seed_sequence = np.random.SeedSequence(seed)
+    children = seed_sequence.spawn(len(STREAM_NAMES))
+    streams = {}
+    for name, child in zip(STREAM_NAMES, children):
+        streams[name] = RandomStream(child, block_size, antithetic)
+    return streams
     
 #Class representing the hospital in the simulation model.
 class HealthcareSystem:
-    def __init__(self, S, K, mu_t, mu_cb, mu_s, myLambda, p1, healed_patients_limit, start_type):
+    def __init__(self, S, K, mu_t, mu_cb, mu_s, myLambda, p1, healed_patients_limit, start_type, seed=DEFAULT_SEED, block_size=4096, engine="classic", nurse_policy="longest_idle", bed_policy="longest_idle", retention="full", time_averages=False, trace=None, fel="heap", instrumentation=None, antithetic=False):
+        if engine not in ENGINES:
+            raise ValueError("engine must be one of " + str(ENGINES) + ", got " + repr(engine))
+        if fel not in FEL_TYPES:
+            raise ValueError("fel must be one of " + str(FEL_TYPES) + ", got " + repr(fel))
+        if fel != "heap" and engine != "fast":
+            raise ValueError("fel " + repr(fel) + " is only supported by the fast engine")
+        if retention not in RETENTION_MODES:
+            raise ValueError("retention must be one of " + str(RETENTION_MODES) + ", got " + repr(retention))
+        if retention == "columnar" and engine != "fast":
+            raise ValueError("retention 'columnar' is only supported by the fast engine")
         self.healed_patients = 0                            #Total number of healed patients.
         self.Lh = 0                                         #Current number of patients at the home treatment. 
         self.Xs = 0                                         #Random number to compare with p1
@@ -60,8 +711,11 @@ class HealthcareSystem:
         self.mu_s = mu_s            #Parameter to generate home treatment time for stable condition. (exponential) 
         self.myLambda = myLambda    #Parameter to generate interarrival time. (exponential)
         self.p1 = p1                #Decision parameter for patient's condition.(stable or critical)
-        self.patient_queue = []     #Array to store patients waiting for triage
-        self.event_queue = []       #Priority queue for events.(heapq is used)
+        self.patient_queue = deque()    #Queue to store patients waiting for triage (FIFO)
+        self.event_list = create_event_list(fel)   #Future event list of the fast engine. (see FEL_TYPES)
+        self.push_event = self.event_list.push      #Function to add an event tuple to the future event list. (fast engine)
+        self.pop_event = self.event_list.pop        #Function to remove the next event tuple from the future event list. (fast engine)
+        self.event_queue = [] if engine == "classic" else self.event_list  #Priority queue for events.(heapq is used by the classic engine)
         self.num_patients_arrived = 0           #Total number of patients arrived with Arrival event.
         self.num_patients_directly_triage = 0   #Total number of patients went to triage without waiting.
         self.num_patients_waiting_triage = 0    #Total number of patients waited for triage.
@@ -88,8 +742,10 @@ class HealthcareSystem:
         self.patient_id_array = []              #Used in logger function for creating table with pandas.
         self.fel_array = []                     #Used in logger function for creating table with pandas.
         self.log_count = 0                      #Used to limit the logger function to print desired number of total events.
-        self.available_nurse_list = []          #List of currently idle nurses.(FIFO)
-        self.available_bed_list = []            #List of currently idle beds.(FIFO)
+        self.nurse_pool = FreeList(nurse_policy, "worked_time")     #Currently idle nurses, selected with nurse_policy.
+        self.bed_pool = FreeList(bed_policy, "occupied_time")       #Currently idle beds, selected with bed_policy.
+        self.available_nurse_list = self.nurse_pool.items           #Container of currently idle nurses.
+        self.available_bed_list = self.bed_pool.items               #Container of currently idle beds.
         self.bed_list = []                      #List of all Bed object instances in the system.
         self.nurse_list = []                    #List of all Nurse object instances in the system.
         self.patient_list = []                  #List of all Patient object instances in the system.
@@ -99,42 +755,83 @@ class HealthcareSystem:
         self.start_time_for_full_triage = 0     #Set to system's current time whenever all nurses are busy.
         self.time_beds_full = 0                 #Total time all beds are busy.
         self.time_triage_full = 0               #Total time all nurses are busy.
+        self.statistics_origin = None           #Accumulators at the last reset_statistics. (None: get_results covers the whole run)
+        self.seed = seed                        #Seed of the simulation. (int or numpy SeedSequence)
+        self.streams = create_streams(seed, block_size, antithetic)     #Random streams of the simulation, one per process.
+        self.arrival_stream = self.streams["arrivals"]          #Stream for interarrival times.
+        self.triage_stream = self.streams["triage"]             #Stream for triage service times.
+        self.bed_stream = self.streams["bed"]                   #Stream for hospital healing times.
+        self.home_stable_stream = self.streams["home_stable"]   #Stream for home healing times of stable patients.
+        self.home_critical_stream = self.streams["home_critical"]   #Stream for alpha and home healing times of critical patients.
+        self.routing_stream = self.streams["routing"]           #Stream for Xs.
+        self.engine = engine                    #Engine used by run_simulation. (classic | fast)
+        self.sequence = 0                       #Sequence number of the next fast engine event, used for deterministic tie-breaking.
+        self.patient_table = {}                 #Patient objects by patient id. (used by the fast engine, only patients in the system with streaming retention)
+        self.streaming = (retention == "streaming")     #True if only online statistics of patients and variates are kept.
+        self.columnar = (retention == "columnar")       #True if patients are kept in patient_store.
+        self.patient_store = PatientStore() if self.columnar else None  #Columns of every patient. (columnar retention)
+        self.first_arrival_id = 0               #Id of the first patient coming with Arrival event. (patients of the initial state have smaller ids)
+        self.sojourn_statistic = OnlineStatistic()      #Time spent in the system by patients coming with Arrival event. (streaming retention)
+        self.variate_statistics = {name: OnlineStatistic() for name in VARIATE_NAMES}  #Sampled variates. (streaming retention)
+        if self.streaming or self.columnar:
+            self.record_interarrival = self.variate_statistics["interarrival"].add
+            self.record_nurse_service = self.variate_statistics["nurse_service"].add
+            self.record_hospital_healing = self.variate_statistics["hospital_healing"].add
+            self.record_home_healing_s = self.variate_statistics["home_healing_s"].add
+            self.record_home_healing_c = self.variate_statistics["home_healing_c"].add
+        else:
+            self.record_interarrival = self.interarrival_array.append
+            self.record_nurse_service = self.nurse_service_array.append
+            self.record_hospital_healing = self.hospital_healing_array.append
+            self.record_home_healing_s = self.home_healing_array_s.append
+            self.record_home_healing_c = self.home_healing_array_c.append
+        self.time_averages = time_averages      #True if state variables are integrated over time on every event.
+        self.occupancy_Lsys = [0.0]             #occupancy_X[k]: total time state variable X was equal to k. (time_averages)
+        self.occupancy_Lq = [0.0]
+        self.occupancy_Lt = [0.0] * (S + 1)
+        self.occupancy_Lb = [0.0] * (K + 1)
+        self.occupancy_Lh = [0.0]
+        self.trace = trace                      #EventTrace of the simulation. (None to disable tracing)
+        self.instrumentation = instrumentation  #Instrumentation of the simulation. (None to disable instrumentation)
+        self.handlers = (self.arrival_fast, self.departure_triage_fast, self.treated_at_home_fast, self.treated_at_hospital_fast)   #Handler table of the fast engine indexed by event code.
+        if self.columnar:
+            self.handlers = (self.arrival_columnar, self.departure_triage_columnar, self.treated_at_home_columnar, self.treated_at_hospital_columnar)
 
     #Function to generate exponential interarrival times with parameter myLambda.
     def generate_interarrival(self):
         scale = 1 / self.myLambda
-        value = float(np.random.exponential(scale=scale, size=1))
-        self.interarrival_array.append(value)
+        value = self.arrival_stream.exponential(scale)
+        self.record_interarrival(value)
         return value
 
     #Function to generate exponential service time for triage nurses with parameter mu_t.
     def generate_nurse_service_time(self):
         scale = 1 / self.mu_t
-        value = float(np.random.exponential(scale=scale, size=1))
-        self.nurse_service_array.append(value)
+        value = self.triage_stream.exponential(scale)
+        self.record_nurse_service(value)
         return value
 
     #Function to generate exponential service time for hospital beds with parameter mu_cb.
     def generate_hospital_healing_time(self):
         scale = 1 / self.mu_cb
-        value = float(np.random.exponential(scale=scale, size=1))
-        self.hospital_healing_array.append(value)
+        value = self.bed_stream.exponential(scale)
+        self.record_hospital_healing(value)
         return value
 
     #Function to generate exponential home healing times. heal_type = "s" for stable, "c" for critical patients.
     def generate_home_healing_time(self, heal_type):
         if heal_type == "s":
             scale = 1 / self.mu_s
-            value = float(np.random.exponential(scale=scale, size=1))
-            self.home_healing_array_s.append(value)
+            value = self.home_stable_stream.exponential(scale)
+            self.record_home_healing_s(value)
             return value
         else:
-            alpha = ((1.75 - 1.25) * random.random()) + 1.25
+            alpha = ((1.75 - 1.25) * self.home_critical_stream.uniform()) + 1.25
             scale =  1 / (self.mu_cb / alpha)
             #normal_time = self.generate_hospital_healing_time()
             #value = alfa * normal_time
-            value = float(np.random.exponential(scale=scale, size=1))
-            self.home_healing_array_c.append(value)
+            value = self.home_critical_stream.exponential(scale)
+            self.record_home_healing_c(value)
             return value
 
     #Function representing arrival of a new patient to the system. 
@@ -148,12 +845,13 @@ class HealthcareSystem:
         patient = event.patient
         self.num_patients_arrived += 1
         event.patient.enter_time = event.time
-        self.patient_list.append(event.patient)
+        if not self.streaming:
+            self.patient_list.append(event.patient)
         if self.Lt < self.S:
             if (self.empty_check):
                 self.time_triage_empty += (self.time - self.start_time_for_empty)
                 self.empty_check = False
-            nurse = self.available_nurse_list.pop(0)
+            nurse = self.nurse_pool.take()
             if (len(self.available_nurse_list) == 0):
                 self.start_time_for_full_triage = self.time
 
@@ -184,14 +882,14 @@ class HealthcareSystem:
     def departure_triage(self, event):
         patient = event.patient
         self.Lt -= 1
-        self.available_nurse_list.append(event.medical_service)
+        event.medical_service.worked_time += event.duration
+        self.nurse_pool.release(event.medical_service)
         if (len(self.available_nurse_list) == 1):
             self.time_triage_full += (self.time - self.start_time_for_full_triage)
-        event.medical_service.worked_time += event.duration
         if (self.Lt == 0):
             self.start_time_for_empty = self.time
             self.empty_check = True
-        self.Xs = random.random()
+        self.Xs = self.routing_stream.uniform()
         if self.Xs < self.p1:
             self.Lh += 1
             random_duration = self.generate_home_healing_time("s")
@@ -205,7 +903,7 @@ class HealthcareSystem:
                     self.beds_empty_check = False
                 self.num_patients_directly_beds += 1
                 self.Lb += 1
-                bed = self.available_bed_list.pop(0)
+                bed = self.bed_pool.take()
                 if (len(self.available_bed_list) == 0):
                     self.start_time_for_full_beds = self.time
                 random_duration = self.generate_hospital_healing_time()
@@ -218,14 +916,14 @@ class HealthcareSystem:
                 event = Event(time=(self.time + random_duration), event_type="Treated_at_Home",  patient=patient, medical_service=None, duration=random_duration)
                 heapq.heappush(self.event_queue, event)
 
-        if self.Lq > 0:
-            patient = self.patient_queue.pop(0)
+        if self.Lq > 0 and self.Lt < self.S:
+            patient = self.patient_queue.popleft()
             self.Lq -= 1
             if (self.empty_check):
                 self.time_triage_empty += (self.time - self.start_time_for_empty)
                 self.empty_check = False
             self.Lt += 1
-            nurse = self.available_nurse_list.pop(0)
+            nurse = self.nurse_pool.take()
             if (len(self.available_nurse_list) == 0):
                self.start_time_for_full_triage = self.time
             random_duration = self.generate_nurse_service_time()
@@ -238,6 +936,8 @@ class HealthcareSystem:
         self.healed_patients += 1
         self.Lsys -= 1
         event.patient.exit_time = event.time
+        if self.streaming:
+            self.release_patient(event.patient)
         self.treated_home += 1
 
     #Function to make necessary state updates whenever a patient is treated at hospital.
@@ -246,19 +946,278 @@ class HealthcareSystem:
         self.healed_patients += 1
         self.Lsys -= 1
         event.patient.exit_time = event.time
+        if self.streaming:
+            self.release_patient(event.patient)
         if(self.Lb == 0):
             self.start_time_for_empty_beds = self.time
             self.beds_empty_check = True
-        self.available_bed_list.append(event.medical_service)
+        event.medical_service.occupied_time += event.duration
+        self.bed_pool.release(event.medical_service)
         if (len(self.available_bed_list) == 1):
             self.time_beds_full += (self.time - self.start_time_for_full_beds)
-        event.medical_service.occupied_time += event.duration
         self.treated_hospital += 1
     
+    #Function to release the record of a healed patient with streaming retention. Time spent in the system is added to sojourn_statistic.
+    def release_patient(self, patient):
+        if patient.id >= self.first_arrival_id:
+            self.sojourn_statistic.add(patient.exit_time - patient.enter_time)
+        if self.engine == "fast":
+            del self.patient_table[patient.id]
+
+    #Fast engine version of arrival. Patients waiting in patient_queue are stored by their index.
+    def arrival_fast(self, patient_index, resource_index):
+        self.Lsys += 1
+        patient = self.patient_table[patient_index]
+        self.num_patients_arrived += 1
+        patient.enter_time = self.time
+        if not self.streaming:
+            self.patient_list.append(patient)
+        if self.Lt < self.S:
+            if (self.empty_check):
+                self.time_triage_empty += (self.time - self.start_time_for_empty)
+                self.empty_check = False
+            nurse = self.nurse_pool.take()
+            if (len(self.available_nurse_list) == 0):
+                self.start_time_for_full_triage = self.time
+
+            self.Lt += 1
+            self.num_patients_directly_triage += 1
+            random_duration = self.generate_nurse_service_time()
+            nurse.service_duration = random_duration
+            self.push_event((self.time + random_duration, self.sequence, DEPARTURE_TRIAGE, patient_index, nurse.id))
+            self.sequence += 1
+        else:
+            self.Lq += 1
+            self.num_patients_waiting_triage += 1
+            self.patient_queue.append(patient_index)
+        patient = Patient(self.patient_id)
+        self.patient_table[patient.id] = patient
+        self.patient_id += 1
+        self.push_event((self.time + self.generate_interarrival(), self.sequence, ARRIVAL, patient.id, -1))
+        self.sequence += 1
+
+    #Fast engine version of departure_triage.
+    def departure_triage_fast(self, patient_index, resource_index):
+        nurse = self.nurse_list[resource_index]
+        self.Lt -= 1
+        nurse.worked_time += nurse.service_duration
+        self.nurse_pool.release(nurse)
+        if (len(self.available_nurse_list) == 1):
+            self.time_triage_full += (self.time - self.start_time_for_full_triage)
+        if (self.Lt == 0):
+            self.start_time_for_empty = self.time
+            self.empty_check = True
+        self.Xs = self.routing_stream.uniform()
+        if self.Xs < self.p1:
+            self.Lh += 1
+            random_duration = self.generate_home_healing_time("s")
+            self.push_event((self.time + random_duration, self.sequence, TREATED_AT_HOME, patient_index, -1))
+            self.sequence += 1
+        else:
+            self.num_patients_arrived_beds += 1
+            if self.Lb < self.K:
+                if(self.beds_empty_check):
+                    self.time_beds_empty += (self.time - self.start_time_for_empty_beds)
+                    self.beds_empty_check = False
+                self.num_patients_directly_beds += 1
+                self.Lb += 1
+                bed = self.bed_pool.take()
+                if (len(self.available_bed_list) == 0):
+                    self.start_time_for_full_beds = self.time
+                random_duration = self.generate_hospital_healing_time()
+                bed.service_duration = random_duration
+                self.push_event((self.time + random_duration, self.sequence, TREATED_AT_HOSPITAL, patient_index, bed.id))
+                self.sequence += 1
+            else:
+                self.num_patients_rejected_beds += 1
+                self.Lh += 1
+                random_duration = self.generate_home_healing_time("c")
+                self.push_event((self.time + random_duration, self.sequence, TREATED_AT_HOME, patient_index, -1))
+                self.sequence += 1
+
+        if self.Lq > 0 and self.Lt < self.S:
+            patient_index = self.patient_queue.popleft()
+            self.Lq -= 1
+            if (self.empty_check):
+                self.time_triage_empty += (self.time - self.start_time_for_empty)
+                self.empty_check = False
+            self.Lt += 1
+            nurse = self.nurse_pool.take()
+            if (len(self.available_nurse_list) == 0):
+               self.start_time_for_full_triage = self.time
+            random_duration = self.generate_nurse_service_time()
+            nurse.service_duration = random_duration
+            self.push_event((self.time + random_duration, self.sequence, DEPARTURE_TRIAGE, patient_index, nurse.id))
+            self.sequence += 1
+
+    #Fast engine version of treated_at_home.
+    def treated_at_home_fast(self, patient_index, resource_index):
+        self.Lh -= 1
+        self.healed_patients += 1
+        self.Lsys -= 1
+        patient = self.patient_table[patient_index]
+        patient.exit_time = self.time
+        if self.streaming:
+            self.release_patient(patient)
+        self.treated_home += 1
+
+    #Fast engine version of treated_at_hospital.
+    def treated_at_hospital_fast(self, patient_index, resource_index):
+        bed = self.bed_list[resource_index]
+        self.Lb -= 1
+        self.healed_patients += 1
+        self.Lsys -= 1
+        patient = self.patient_table[patient_index]
+        patient.exit_time = self.time
+        if self.streaming:
+            self.release_patient(patient)
+        if(self.Lb == 0):
+            self.start_time_for_empty_beds = self.time
+            self.beds_empty_check = True
+        bed.occupied_time += bed.service_duration
+        self.bed_pool.release(bed)
+        if (len(self.available_bed_list) == 1):
+            self.time_beds_full += (self.time - self.start_time_for_full_beds)
+        self.treated_hospital += 1
+
+    #Columnar retention version of arrival_fast. Patients are rows of patient_store, no Patient objects are created.
+    def arrival_columnar(self, patient_index, resource_index):
+        store = self.patient_store
+        self.Lsys += 1
+        self.num_patients_arrived += 1
+        store.enter_time[patient_index] = self.time
+        if self.Lt < self.S:
+            if (self.empty_check):
+                self.time_triage_empty += (self.time - self.start_time_for_empty)
+                self.empty_check = False
+            nurse = self.nurse_pool.take()
+            if (len(self.available_nurse_list) == 0):
+                self.start_time_for_full_triage = self.time
+
+            self.Lt += 1
+            self.num_patients_directly_triage += 1
+            store.triage_start[patient_index] = self.time
+            random_duration = self.generate_nurse_service_time()
+            nurse.service_duration = random_duration
+            self.push_event((self.time + random_duration, self.sequence, DEPARTURE_TRIAGE, patient_index, nurse.id))
+            self.sequence += 1
+        else:
+            self.Lq += 1
+            self.num_patients_waiting_triage += 1
+            self.patient_queue.append(patient_index)
+        patient_index = store.add()
+        self.patient_id += 1
+        self.push_event((self.time + self.generate_interarrival(), self.sequence, ARRIVAL, patient_index, -1))
+        self.sequence += 1
+
+    #Columnar retention version of departure_triage_fast.
+    def departure_triage_columnar(self, patient_index, resource_index):
+        store = self.patient_store
+        nurse = self.nurse_list[resource_index]
+        self.Lt -= 1
+        nurse.worked_time += nurse.service_duration
+        self.nurse_pool.release(nurse)
+        store.triage_end[patient_index] = self.time
+        if (len(self.available_nurse_list) == 1):
+            self.time_triage_full += (self.time - self.start_time_for_full_triage)
+        if (self.Lt == 0):
+            self.start_time_for_empty = self.time
+            self.empty_check = True
+        self.Xs = self.routing_stream.uniform()
+        if self.Xs < self.p1:
+            self.Lh += 1
+            store.route[patient_index] = ROUTE_HOME_STABLE
+            random_duration = self.generate_home_healing_time("s")
+            self.push_event((self.time + random_duration, self.sequence, TREATED_AT_HOME, patient_index, -1))
+            self.sequence += 1
+        else:
+            self.num_patients_arrived_beds += 1
+            if self.Lb < self.K:
+                if(self.beds_empty_check):
+                    self.time_beds_empty += (self.time - self.start_time_for_empty_beds)
+                    self.beds_empty_check = False
+                self.num_patients_directly_beds += 1
+                self.Lb += 1
+                store.route[patient_index] = ROUTE_BED
+                bed = self.bed_pool.take()
+                if (len(self.available_bed_list) == 0):
+                    self.start_time_for_full_beds = self.time
+                random_duration = self.generate_hospital_healing_time()
+                bed.service_duration = random_duration
+                self.push_event((self.time + random_duration, self.sequence, TREATED_AT_HOSPITAL, patient_index, bed.id))
+                self.sequence += 1
+            else:
+                self.num_patients_rejected_beds += 1
+                self.Lh += 1
+                store.route[patient_index] = ROUTE_HOME_CRITICAL
+                random_duration = self.generate_home_healing_time("c")
+                self.push_event((self.time + random_duration, self.sequence, TREATED_AT_HOME, patient_index, -1))
+                self.sequence += 1
+
+        if self.Lq > 0 and self.Lt < self.S:
+            patient_index = self.patient_queue.popleft()
+            self.Lq -= 1
+            if (self.empty_check):
+                self.time_triage_empty += (self.time - self.start_time_for_empty)
+                self.empty_check = False
+            self.Lt += 1
+            store.triage_start[patient_index] = self.time
+            nurse = self.nurse_pool.take()
+            if (len(self.available_nurse_list) == 0):
+               self.start_time_for_full_triage = self.time
+            random_duration = self.generate_nurse_service_time()
+            nurse.service_duration = random_duration
+            self.push_event((self.time + random_duration, self.sequence, DEPARTURE_TRIAGE, patient_index, nurse.id))
+            self.sequence += 1
+
+    #Columnar retention version of treated_at_home_fast.
+    def treated_at_home_columnar(self, patient_index, resource_index):
+        self.Lh -= 1
+        self.healed_patients += 1
+        self.Lsys -= 1
+        self.patient_store.exit_time[patient_index] = self.time
+        self.treated_home += 1
+
+    #Columnar retention version of treated_at_hospital_fast.
+    def treated_at_hospital_columnar(self, patient_index, resource_index):
+        bed = self.bed_list[resource_index]
+        self.Lb -= 1
+        self.healed_patients += 1
+        self.Lsys -= 1
+        self.patient_store.exit_time[patient_index] = self.time
+        if(self.Lb == 0):
+            self.start_time_for_empty_beds = self.time
+            self.beds_empty_check = True
+        bed.occupied_time += bed.service_duration
+        self.bed_pool.release(bed)
+        if (len(self.available_bed_list) == 1):
+            self.time_beds_full += (self.time - self.start_time_for_full_beds)
+        self.treated_hospital += 1
+
     #Function used to advance system time according to the event.
     def advance_time(self, event):
+        if self.time_averages:
+            self.integrate_state(event.time - self.time)
         self.time = event.time
 
+    #Function to add the elapsed time to the occupancy of the current value of every state variable. O(1) per event.
+    #Lt and Lb are bounded by S and K, the unbounded ones are grown on demand.
+    def integrate_state(self, elapsed):
+        self.occupancy_Lt[self.Lt] += elapsed
+        self.occupancy_Lb[self.Lb] += elapsed
+        occupancy = self.occupancy_Lsys
+        if self.Lsys >= len(occupancy):
+            occupancy.extend([0.0] * (self.Lsys + 1))
+        occupancy[self.Lsys] += elapsed
+        occupancy = self.occupancy_Lq
+        if self.Lq >= len(occupancy):
+            occupancy.extend([0.0] * (self.Lq + 1))
+        occupancy[self.Lq] += elapsed
+        occupancy = self.occupancy_Lh
+        if self.Lh >= len(occupancy):
+            occupancy.extend([0.0] * (self.Lh + 1))
+        occupancy[self.Lh] += elapsed
+
     #General function to execute different events according to their types. Also logger function is triggered to store the history limited with log_count. 
     def execute_event(self, event):
         self.advance_time(event)
@@ -275,15 +1234,20 @@ class HealthcareSystem:
             self.logger(event)
             self.log_count += 1
 
+    #Traced version of execute_event used by the classic engine when an event trace is enabled.
+    def execute_event_traced(self, event):
+        self.execute_event(event)
+        self.trace.record(self, EVENT_CODES[event.event_type], event.patient.id, event.medical_service.id if event.medical_service is not None else -1)
+
     #Function to initialize the simulation with necessary values and creations of objects.
     def initialize_simulation(self):
         for i in range(self.S):
             nurse = Nurse(i)
-            self.available_nurse_list.append(nurse)
+            self.nurse_pool.release(nurse)
             self.nurse_list.append(nurse)
         for i in range(self.K):
             bed = Bed(i)
-            self.available_bed_list.append(bed)
+            self.bed_pool.release(bed)
             self.bed_list.append(bed)
         
         if self.start_type == "empty":
@@ -307,38 +1271,170 @@ class HealthcareSystem:
             self.Lb = num_bed
             self.Lsys = num_triage + num_bed
             for index in range(num_triage):
-                patient = Patient(self.patient_id)
-                self.patient_id += 1
-                nurse = self.available_nurse_list.pop(0)
+                patient = self.create_patient()
+                if self.columnar:
+                    self.patient_store.triage_start[patient.id] = self.time
+                nurse = self.nurse_pool.take()
                 random_duration = self.generate_nurse_service_time()
-                event = Event(time=(self.time + random_duration), event_type="Departure_Triage",  patient=patient, medical_service=nurse, duration=random_duration)
-                heapq.heappush(self.event_queue, event)
+                self.schedule_event(DEPARTURE_TRIAGE, patient, nurse, random_duration)
             if (len(self.available_nurse_list) == 0):
                self.start_time_for_full_triage = self.time
             for index in range(num_bed):
-                patient = Patient(self.patient_id)
-                self.patient_id += 1
-                bed = self.available_bed_list.pop(0)
+                patient = self.create_patient()
+                if self.columnar:
+                    self.patient_store.route[patient.id] = ROUTE_BED
+                bed = self.bed_pool.take()
                 random_duration = self.generate_hospital_healing_time()
-                event = Event(time=(self.time + random_duration), event_type="Treated_at_Hospital",  patient=patient, medical_service=bed, duration=random_duration)
-                heapq.heappush(self.event_queue, event)
+                self.schedule_event(TREATED_AT_HOSPITAL, patient, bed, random_duration)
             if (len(self.available_bed_list) == 0):
                 self.start_time_for_full_beds = self.time
             
 
+        self.first_arrival_id = self.patient_id
+        patient = self.create_patient()
+        if self.engine == "fast":
+            self.handlers[ARRIVAL](patient.id, -1)
+            if self.trace is not None:
+                self.trace.record(self, ARRIVAL, patient.id, -1)
+        else:
+            event = Event(time=self.time, event_type="Arrival", patient=patient, medical_service=None, duration=0)
+            self.execute_event(event)
+            if self.trace is not None:
+                self.trace.record(self, ARRIVAL, patient.id, -1)
+
+    #Function to create a new patient with a unique id. In the fast engine the patient is also stored in patient_table.
+    #With columnar retention a row is added to patient_store instead, the returned Patient only carries the id.
+    def create_patient(self):
         patient = Patient(self.patient_id)
         self.patient_id += 1
-        event = Event(time=self.time, event_type="Arrival", patient=patient, medical_service=None, duration=0)
-        self.execute_event(event)
+        if self.columnar:
+            self.patient_store.add()
+            self.patient_store.enter_time[patient.id] = self.time
+        elif self.engine == "fast":
+            self.patient_table[patient.id] = patient
+        return patient
+
+    #Function to add an event with the given code to the event_queue in the representation of the selected engine.
+    #Used while initializing the simulation, the fast engine handlers push their tuples directly.
+    def schedule_event(self, code, patient, medical_service, duration):
+        if self.engine == "fast":
+            resource_index = -1
+            if medical_service is not None:
+                medical_service.service_duration = duration
+                resource_index = medical_service.id
+            self.push_event((self.time + duration, self.sequence, code, patient.id, resource_index))
+            self.sequence += 1
+        else:
+            event = Event(time=(self.time + duration), event_type=EVENT_TYPES[code], patient=patient, medical_service=medical_service, duration=duration)
+            heapq.heappush(self.event_queue, event)
 
     #Function used to run the simulation.
     def run_simulation(self):
         
         self.initialize_simulation()      
+        self.resume_simulation()
 
+    #Function used to continue an initialized simulation until healed_patients reaches healed_patients_limit.
+    #Raising healed_patients_limit and calling it again extends the run, as if it was run with the larger limit from the start.
+    def resume_simulation(self):
+        if self.instrumentation is not None:
+            self.instrumentation.start()
+        if self.engine == "fast":
+            self.run_simulation_fast()
+        else:
+            if self.instrumentation is not None:
+                execute_event = self.execute_event_instrumented
+            elif self.trace is not None:
+                execute_event = self.execute_event_traced
+            else:
+                execute_event = self.execute_event
+
+            while self.healed_patients < self.healed_patients_limit:
+                event = heapq.heappop(self.event_queue)
+                execute_event(event)        
+        if self.trace is not None:
+            self.trace.flush()
+        if self.instrumentation is not None:
+            self.instrumentation.finish(self)
+
+    #Instrumented version of execute_event used by the classic engine when instrumentation is enabled.
+    #Like run_instrumented_loop, the event is traced after its time is recorded.
+    def execute_event_instrumented(self, event):
+        start = time.perf_counter_ns()
+        self.execute_event(event)
+        self.instrumentation.record(self, EVENT_CODES[event.event_type], time.perf_counter_ns() - start, len(self.event_queue))
+        if self.trace is not None:
+            self.trace.record(self, EVENT_CODES[event.event_type], event.patient.id, event.medical_service.id if event.medical_service is not None else -1)
+
+    #Function used to run the simulation with the fast engine.
+    #Events are (time, sequence number, event code, patient index, resource index) tuples, so heapq compares them in C
+    #and ties are broken by the sequence number. They are kept in event_list. (heap or calendar queue, see FEL_TYPES)
+    #Handlers are looked up from the handlers table by event code.
+    #The logger is not used by the fast engine.
+    def run_simulation_fast(self):
+        pop_event = self.pop_event
+        handlers = self.handlers
+        healed_patients_limit = self.healed_patients_limit
+        if self.instrumentation is not None:
+            self.run_instrumented_loop()
+            return
+        if self.trace is not None:
+            trace = self.trace
+            while self.healed_patients < healed_patients_limit:
+                event_time, sequence, code, patient_index, resource_index = pop_event()
+                if self.time_averages:
+                    self.integrate_state(event_time - self.time)
+                self.time = event_time
+                handlers[code](patient_index, resource_index)
+                trace.record(self, code, patient_index, resource_index)
+            return
+        if self.time_averages:
+            integrate_state = self.integrate_state
+            while self.healed_patients < healed_patients_limit:
+                event_time, sequence, code, patient_index, resource_index = pop_event()
+                integrate_state(event_time - self.time)
+                self.time = event_time
+                handlers[code](patient_index, resource_index)
+            return
+        while self.healed_patients < healed_patients_limit:
+            event_time, sequence, code, patient_index, resource_index = pop_event()
+            self.time = event_time
+            handlers[code](patient_index, resource_index)
+
+    #Instrumented event loop of the fast engine, also handles time_averages and trace.
+    def run_instrumented_loop(self):
+        pop_event = self.pop_event
+        handlers = self.handlers
+        event_list = self.event_list
+        record = self.instrumentation.record
+        clock = time.perf_counter_ns
         while self.healed_patients < self.healed_patients_limit:
-            event = heapq.heappop(self.event_queue)
-            self.execute_event(event)        
+            event_time, sequence, code, patient_index, resource_index = pop_event()
+            if self.time_averages:
+                self.integrate_state(event_time - self.time)
+            self.time = event_time
+            start = clock()
+            handlers[code](patient_index, resource_index)
+            record(self, code, clock() - start, len(event_list))
+            if self.trace is not None:
+                self.trace.record(self, code, patient_index, resource_index)
+
+    #Function to get the summary of the instrumentation of the last run. (None if instrumentation is disabled)
+    def get_instrumentation_summary(self):
+        if self.instrumentation is None:
+            return None
+        return self.instrumentation.summary
+
+    #Function to take a snapshot of the future event list as FEL_DTYPE records sorted by time. Only taken on request.
+    def get_fel_snapshot(self):
+        snapshot = np.zeros(len(self.event_queue), dtype=FEL_DTYPE)
+        for index, entry in enumerate(sorted(self.event_queue)):
+            if self.engine == "fast":
+                snapshot[index] = (-1, entry[0], entry[2], entry[3], entry[4])
+            else:
+                resource = entry.medical_service.id if entry.medical_service is not None else -1
+                snapshot[index] = (-1, entry.time, EVENT_CODES[entry.event_type], entry.patient.id, resource)
+        return snapshot
 
     #Function used to store the simulation data. Used for pandas  
     def logger(self,event):
@@ -362,8 +1458,314 @@ class HealthcareSystem:
                 details = "[" + "T_H" + " @ " + str(i.time) + " P:" + str(i.patient.id) + "]"
             temp.append(details)
         self.fel_array.append(temp)
-        
-        
+
+    #Function to calculate the output metrics (see RESULT_LABELS) of the simulation after run_simulation.
+    #Ratios that are undefined for the run (e.g. no critical patient arrived) are reported as nan.
+    #After reset_statistics the metrics cover the period since the reset. (see get_period_results)
+    def get_results(self):
+        if self.statistics_origin is not None:
+            return self.get_period_results()
+        results = {}
+        results["nurse_available"] = (self.time - self.time_triage_full) / self.time
+        results["bed_available"] = (self.time - self.time_beds_full) / self.time
+        results["joint"] = results["bed_available"] * results["nurse_available"]
+        if self.num_patients_arrived_beds > 0:
+            results["bed_rejection_ratio"] = self.num_patients_rejected_beds / self.num_patients_arrived_beds
+        else:
+            results["bed_rejection_ratio"] = math.nan
+        results["nurse_utilization"] = stat.mean([nurse.worked_time / self.time for nurse in self.nurse_list]) if self.S > 0 else math.nan
+        results["bed_utilization"] = stat.mean([bed.occupied_time / self.time for bed in self.bed_list]) if self.K > 0 else math.nan
+        results["home_treated_fraction"] = self.treated_home / self.num_patients_arrived
+        if self.streaming:
+            results["time_to_heal"] = self.sojourn_statistic.summary()["mean"]
+        elif self.columnar:
+            sojourn_times = self.patient_store.sojourn_times(self.first_arrival_id)
+            results["time_to_heal"] = float(sojourn_times.mean()) if len(sojourn_times) > 0 else math.nan
+        else:
+            results["time_to_heal"] = stat.mean(self.get_time_spent_list()) if self.patient_list else math.nan
+        return results
+
+    #Function to restart the output metrics of get_results at the current time, e.g. after a warm-up or a parameter change.
+    #The simulation itself is not changed, a snapshot of the accumulators is taken and get_results reports the period since it.
+    #Busy times of the services in progress are counted from the snapshot on.
+    def reset_statistics(self):
+        worked_time = [nurse.worked_time for nurse in self.nurse_list]
+        occupied_time = [bed.occupied_time for bed in self.bed_list]
+        #Busy time before the snapshot is added to the origin, it is added to the resource when the service ends.
+        if self.engine == "fast":
+            for event_time, sequence, code, patient_index, resource_index in self.event_list:
+                if code == DEPARTURE_TRIAGE:
+                    worked_time[resource_index] += self.nurse_list[resource_index].service_duration - (event_time - self.time)
+                elif code == TREATED_AT_HOSPITAL:
+                    occupied_time[resource_index] += self.bed_list[resource_index].service_duration - (event_time - self.time)
+        else:
+            for event in self.event_queue:
+                if event.event_type == "Departure_Triage":
+                    worked_time[event.medical_service.id] += event.duration - (event.time - self.time)
+                elif event.event_type == "Treated_at_Hospital":
+                    occupied_time[event.medical_service.id] += event.duration - (event.time - self.time)
+        self.sojourn_statistic.flush()
+        self.statistics_origin = {"time": self.time,
+                                  "time_triage_full": self.get_full_time(self.nurse_pool, self.time_triage_full, self.start_time_for_full_triage),
+                                  "time_beds_full": self.get_full_time(self.bed_pool, self.time_beds_full, self.start_time_for_full_beds),
+                                  "worked_time": worked_time,
+                                  "occupied_time": occupied_time,
+                                  "num_patients_arrived": self.num_patients_arrived,
+                                  "num_patients_arrived_beds": self.num_patients_arrived_beds,
+                                  "num_patients_rejected_beds": self.num_patients_rejected_beds,
+                                  "treated_home": self.treated_home,
+                                  "sojourn_count": self.sojourn_statistic.count,
+                                  "sojourn_sum": self.sojourn_statistic.count * self.sojourn_statistic.mean}
+
+    #Function to get the total time a pool had no idle resource, including the full period in progress.
+    def get_full_time(self, pool, full_time, full_start):
+        return full_time + (self.time - full_start) if len(pool) == 0 else full_time
+
+    #Function to calculate the output metrics of the period since reset_statistics, the same way as get_results.
+    #Utilizations are averaged over the active resources only (retired resources are left out).
+    def get_period_results(self):
+        origin = self.statistics_origin
+        elapsed = self.time - origin["time"]
+        results = {}
+        results["nurse_available"] = (elapsed - (self.get_full_time(self.nurse_pool, self.time_triage_full, self.start_time_for_full_triage) - origin["time_triage_full"])) / elapsed
+        results["bed_available"] = (elapsed - (self.get_full_time(self.bed_pool, self.time_beds_full, self.start_time_for_full_beds) - origin["time_beds_full"])) / elapsed
+        results["joint"] = results["bed_available"] * results["nurse_available"]
+        arrived_beds = self.num_patients_arrived_beds - origin["num_patients_arrived_beds"]
+        results["bed_rejection_ratio"] = (self.num_patients_rejected_beds - origin["num_patients_rejected_beds"]) / arrived_beds if arrived_beds > 0 else math.nan
+        nurses = [nurse for nurse in self.nurse_list if nurse.id not in self.nurse_pool.retired]
+        beds = [bed for bed in self.bed_list if bed.id not in self.bed_pool.retired]
+        results["nurse_utilization"] = stat.mean([(nurse.worked_time - origin["worked_time"][nurse.id]) / elapsed for nurse in nurses]) if nurses else math.nan
+        results["bed_utilization"] = stat.mean([(bed.occupied_time - origin["occupied_time"][bed.id]) / elapsed for bed in beds]) if beds else math.nan
+        arrived = self.num_patients_arrived - origin["num_patients_arrived"]
+        results["home_treated_fraction"] = (self.treated_home - origin["treated_home"]) / arrived if arrived > 0 else math.nan
+        if self.streaming:
+            self.sojourn_statistic.flush()
+            healed = self.sojourn_statistic.count - origin["sojourn_count"]
+            results["time_to_heal"] = (self.sojourn_statistic.count * self.sojourn_statistic.mean - origin["sojourn_sum"]) / healed if healed > 0 else math.nan
+        else:
+            if self.columnar:
+                sojourn_times = self.patient_store.sojourn_times(self.first_arrival_id, origin["time"]).tolist()
+            else:
+                sojourn_times = [patient.exit_time - patient.enter_time for patient in self.patient_list
+                                 if patient.exit_time > origin["time"] and patient.exit_time - patient.enter_time > 0]
+            results["time_to_heal"] = stat.mean(sojourn_times) if sojourn_times else math.nan
+        return results
+
+    #Function to get the time-weighted occupancy distribution of a state variable (see STATE_NAMES) as a numpy array.
+    #Element k is the long-run fraction of time the state variable was equal to k, e.g. P(Lb = k) for k = 0..K. (time_averages)
+    def get_occupancy_distribution(self, name):
+        occupancy = np.array(getattr(self, "occupancy_" + name))
+        last = np.flatnonzero(occupancy)
+        if self.time == 0 or len(last) == 0:
+            return occupancy
+        occupancy = occupancy[:max(last[-1] + 1, {"Lt": self.S + 1, "Lb": self.K + 1}.get(name, 0))]
+        return occupancy / self.time
+
+    #Function to get the time averages of every state variable (see STATE_NAMES). (time_averages)
+    def get_time_averages(self):
+        averages = {}
+        for name in STATE_NAMES:
+            occupancy = getattr(self, "occupancy_" + name)
+            averages[name] = math.fsum(k * occupancy[k] for k in range(len(occupancy))) / self.time
+        return averages
+
+    #Function to compare the time average number of patients in the system with Little's law, L = lambda * W,
+    #where lambda is the observed arrival rate and W is the average time a sick person gets better. (time_averages)
+    #The two sides agree in the long run; patients of the initial state and patients still in the system cause small differences.
+    def get_littles_law_check(self):
+        L = self.get_time_averages()["Lsys"]
+        arrival_rate = self.num_patients_arrived / self.time
+        W = self.get_results()["time_to_heal"]
+        return {"L": L, "lambda": arrival_rate, "W": W, "lambda_W": arrival_rate * W}
+
+    #Function to get the complete state of an initialized fast engine simulation as a dictionary of numbers, lists and numpy arrays:
+    #parameters, STATE_SCALARS, nurses, beds, idle lists, triage queue, patients, future event list, random streams and statistics.
+    #HealthcareSystem.from_state creates a simulation that continues exactly as this one would. Trace and instrumentation are not stored.
+    def get_state(self):
+        if self.engine != "fast":
+            raise ValueError("simulation states are only supported by the fast engine")
+        if not hasattr(self, "Lsys"):
+            raise ValueError("simulation is not initialized")
+        state = {"version": STATE_VERSION}
+        state["params"] = {"start_type": self.start_type, "seed": self.seed, "block_size": self.streams["arrivals"].block_size,
+                           "antithetic": self.streams["arrivals"].antithetic,
+                           "nurse_policy": self.nurse_pool.policy, "bed_policy": self.bed_pool.policy,
+                           "retention": "streaming" if self.streaming else "columnar" if self.columnar else "full", "time_averages": self.time_averages,
+                           "fel": "heap" if isinstance(self.event_list, HeapEventList) else "calendar"}
+        state["scalars"] = {name: getattr(self, name) for name in STATE_SCALARS}
+        state["nurses"] = [(nurse.worked_time, nurse.service_duration) for nurse in self.nurse_list]
+        state["beds"] = [(bed.occupied_time, bed.service_duration) for bed in self.bed_list]
+        #Idle lists are stored by resource id in container order, heaps also store the key of every entry.
+        state["idle_nurses"] = [entry[:2] if isinstance(entry, tuple) else entry.id for entry in self.available_nurse_list]
+        state["idle_beds"] = [entry[:2] if isinstance(entry, tuple) else entry.id for entry in self.available_bed_list]
+        state["retirement"] = {"nurses": (self.nurse_pool.retiring, sorted(self.nurse_pool.retired)),
+                               "beds": (self.bed_pool.retiring, sorted(self.bed_pool.retired))}
+        state["statistics_origin"] = self.statistics_origin
+        state["patient_queue"] = np.array(self.patient_queue, dtype=np.int64)
+        patients = list(self.patient_table.values())
+        state["patient_ids"] = np.array([patient.id for patient in patients], dtype=np.int64)
+        state["enter_times"] = np.array([patient.enter_time for patient in patients], dtype=float)
+        state["exit_times"] = np.array([patient.exit_time for patient in patients], dtype=float)
+        state["patient_list"] = np.array([patient.id for patient in self.patient_list], dtype=np.int64)
+        if self.columnar:
+            state["patient_store"] = self.patient_store.get_state()
+        #Entries are stored in container order, so the restored heap (or calendar) has exactly the same layout.
+        state["events"] = np.array(list(self.event_list), dtype=EVENT_DTYPE)
+        if isinstance(self.event_list, CalendarEventList):
+            state["calendar"] = {"bucket_count": self.event_list.bucket_count, "bucket_width": self.event_list.bucket_width,
+                                 "virtual": self.event_list.virtual, "minimum_buckets": self.event_list.minimum_buckets,
+                                 "last_time": self.event_list.last_time}
+        state["streams"] = {name: stream.get_state() for name, stream in self.streams.items()}
+        state["sojourn_statistic"] = self.sojourn_statistic.get_state()
+        state["variate_statistics"] = {name: statistic.get_state() for name, statistic in self.variate_statistics.items()}
+        state["variates"] = {name: np.array(getattr(self, name), dtype=float) for name in
+                             ("interarrival_array", "nurse_service_array", "hospital_healing_array", "home_healing_array_s", "home_healing_array_c")}
+        state["occupancy"] = {name: list(getattr(self, "occupancy_" + name)) for name in STATE_NAMES}
+        return state
+
+    #Function to create a simulation from a state returned by get_state. The simulation continues with resume_simulation.
+    @classmethod
+    def from_state(cls, state, trace=None, instrumentation=None):
+        if state.get("version") != STATE_VERSION:
+            raise ValueError("unsupported simulation state version " + repr(state.get("version")) + ", expected " + str(STATE_VERSION))
+        scalars = state["scalars"]
+        system = cls(scalars["S"], scalars["K"], scalars["mu_t"], scalars["mu_cb"], scalars["mu_s"], scalars["myLambda"], scalars["p1"],
+                     scalars["healed_patients_limit"], engine="fast", trace=trace, instrumentation=instrumentation, **state["params"])
+        for name in STATE_SCALARS:
+            setattr(system, name, scalars[name])
+        for id, (worked_time, service_duration) in enumerate(state["nurses"]):
+            nurse = Nurse(id)
+            nurse.worked_time = worked_time
+            nurse.service_duration = service_duration
+            system.nurse_list.append(nurse)
+        for id, (occupied_time, service_duration) in enumerate(state["beds"]):
+            bed = Bed(id)
+            bed.occupied_time = occupied_time
+            bed.service_duration = service_duration
+            system.bed_list.append(bed)
+        for pool, resources, entries in ((system.nurse_pool, system.nurse_list, state["idle_nurses"]), (system.bed_pool, system.bed_list, state["idle_beds"])):
+            for entry in entries:
+                pool.items.append((entry[0], entry[1], resources[entry[1]]) if isinstance(entry, tuple) else resources[entry])
+        retirement = state.get("retirement", {"nurses": (0, []), "beds": (0, [])})
+        for pool, (retiring, retired) in ((system.nurse_pool, retirement["nurses"]), (system.bed_pool, retirement["beds"])):
+            pool.set_retiring(retiring)
+            pool.retired.update(retired)
+        system.statistics_origin = state.get("statistics_origin")
+        system.patient_queue.extend(state["patient_queue"].tolist())
+        for id, enter_time, exit_time in zip(state["patient_ids"].tolist(), state["enter_times"].tolist(), state["exit_times"].tolist()):
+            patient = Patient(id)
+            patient.enter_time = enter_time
+            patient.exit_time = exit_time
+            system.patient_table[id] = patient
+        system.patient_list.extend(system.patient_table[id] for id in state["patient_list"].tolist())
+        if "patient_store" in state:
+            system.patient_store.set_state(state["patient_store"])
+        entries = state["events"].tolist()
+        if "calendar" in state:
+            calendar = state["calendar"]
+            event_list = system.event_list
+            event_list.minimum_buckets = calendar["minimum_buckets"]
+            event_list.setup(calendar["bucket_count"], calendar["bucket_width"], calendar["virtual"])
+            event_list.last_time = calendar.get("last_time", calendar["virtual"] * calendar["bucket_width"])
+            for entry in entries:
+                event_list.buckets[int(entry[0] / event_list.bucket_width) % event_list.bucket_count].append(entry)
+            event_list.size = len(entries)
+        else:
+            system.event_list.items.extend(entries)
+        for name, stream in system.streams.items():
+            stream.set_state(state["streams"][name])
+        system.sojourn_statistic.set_state(state["sojourn_statistic"])
+        for name, statistic in system.variate_statistics.items():
+            statistic.set_state(state["variate_statistics"][name])
+        for name, values in state["variates"].items():
+            getattr(system, name).extend(values.tolist())
+        for name, occupancy in state["occupancy"].items():
+            setattr(system, "occupancy_" + name, list(occupancy))
+        return system
+
+    #Function to change parameters (see CHANGEABLE_PARAMS) of an initialized simulation from the current time on.
+    #Added nurses and beds are idle. Removed nurses and beds are retired (see resize_resources), so resource ids and the
+    #scheduled events stay valid. The output metrics are restarted at the change (see reset_statistics), so get_results
+    #reports the changed simulation only.
+    def change_parameters(self, **changes):
+        for name in changes:
+            if name not in CHANGEABLE_PARAMS:
+                raise ValueError("parameter must be one of " + str(CHANGEABLE_PARAMS) + ", got " + repr(name))
+        if "S" in changes:
+            self.resize_resources(self.nurse_pool, self.nurse_list, Nurse, changes["S"], self.Lt, "start_time_for_full_triage", "time_triage_full")
+            self.S = changes["S"]
+            self.occupancy_Lt.extend([0.0] * (self.S + 1 - len(self.occupancy_Lt)))
+        if "K" in changes:
+            self.resize_resources(self.bed_pool, self.bed_list, Bed, changes["K"], self.Lb, "start_time_for_full_beds", "time_beds_full")
+            self.K = changes["K"]
+            self.occupancy_Lb.extend([0.0] * (self.K + 1 - len(self.occupancy_Lb)))
+        for name in ("mu_t", "mu_cb", "mu_s", "myLambda", "p1", "healed_patients_limit"):
+            if name in changes:
+                setattr(self, name, changes[name])
+        self.reset_statistics()
+
+    #Function to change the number of active resources of a pool (busy resources not pending retirement and idle ones) to count.
+    #Removed resources are retired (see FreeList.retire): idle ones at once, busy ones when their service ends, so they can
+    #be removed at any time. Retired resources are kept in resources with their busy times, but never selected again.
+    #Pending retirements are cancelled before new resources are added, added resources are idle.
+    #A full period (no idle resource) is closed if resources are added and opened if the last idle resources are retired.
+    def resize_resources(self, pool, resources, resource_class, count, busy, full_start_name, full_time_name):
+        was_full = len(pool) == 0
+        active = busy - pool.retiring + len(pool)
+        if count < active:
+            pool.retire(active - count)
+        else:
+            added = count - active - pool.cancel_retirement(count - active)
+            for index in range(added):
+                resource = resource_class(len(resources))
+                resources.append(resource)
+                pool.release(resource)
+        if was_full and len(pool) > 0:
+            setattr(self, full_time_name, getattr(self, full_time_name) + (self.time - getattr(self, full_start_name)))
+        elif not was_full and len(pool) == 0:
+            setattr(self, full_start_name, self.time)
+
+    #Function to get the additive accumulators behind the metrics of get_results. The metrics of any period of the run
+    #can be calculated from the difference of the accumulators at its ends. (see sequential.py) Requires streaming retention.
+    def get_accumulators(self):
+        self.sojourn_statistic.flush()
+        return {"time": self.time,
+                "time_triage_full": self.time_triage_full,
+                "time_beds_full": self.time_beds_full,
+                "worked_time": math.fsum(nurse.worked_time for nurse in self.nurse_list),
+                "occupied_time": math.fsum(bed.occupied_time for bed in self.bed_list),
+                "num_patients_arrived": self.num_patients_arrived,
+                "num_patients_arrived_beds": self.num_patients_arrived_beds,
+                "num_patients_rejected_beds": self.num_patients_rejected_beds,
+                "treated_home": self.treated_home,
+                "sojourn_count": self.sojourn_statistic.count,
+                "sojourn_sum": self.sojourn_statistic.count * self.sojourn_statistic.mean}
+
+    #Function to get the time spent in the system by every healed patient that came with Arrival event. (full and columnar retention)
+    def get_time_spent_list(self):
+        if self.columnar:
+            return self.patient_store.sojourn_times(self.first_arrival_id).tolist()
+        time_spent_list = []
+        for i in self.patient_list:
+            added_time = i.exit_time - i.enter_time
+            if added_time > 0:
+                time_spent_list.append(added_time)
+        return time_spent_list
+
+    #Function to get the summaries (see OnlineStatistic.summary) of the time spent in the system and of every sampled variate.
+    #With full retention the summaries are calculated exactly from the stored records, with columnar retention only the sojourn summary.
+    def get_distribution_summaries(self):
+        if self.streaming or self.columnar:
+            summaries = {"sojourn": self.sojourn_statistic.summary() if self.streaming else exact_summary(self.get_time_spent_list())}
+            for name in VARIATE_NAMES:
+                summaries[name] = self.variate_statistics[name].summary()
+            return summaries
+        return {"sojourn": exact_summary(self.get_time_spent_list()),
+                "interarrival": exact_summary(self.interarrival_array),
+                "nurse_service": exact_summary(self.nurse_service_array),
+                "hospital_healing": exact_summary(self.hospital_healing_array),
+                "home_healing_s": exact_summary(self.home_healing_array_s),
+                "home_healing_c": exact_summary(self.home_healing_array_c)}
 
 if __name__ == "__main__":
     S = 4
@@ -375,8 +1777,9 @@ if __name__ == "__main__":
     myLambda = 1
     healed_patients_limit = 20
     start_type = "empty"
+    seed = DEFAULT_SEED
     
-    system = HealthcareSystem(S, K, mu_t, mu_cb, mu_s, myLambda, p1, healed_patients_limit, start_type)
+    system = HealthcareSystem(S, K, mu_t, mu_cb, mu_s, myLambda, p1, healed_patients_limit, start_type, seed)
     system.run_simulation()
     
     #50 EVENTS
@@ -390,65 +1793,9 @@ if __name__ == "__main__":
     print(system.nurse_service_array)
     print(system.hospital_healing_array)
     """
-    # Long-run being empty triage:
-    
-    print("Long-run probability of arriving patient finds an available nurse")
-    print((system.time - system.time_triage_full) / system.time)
-    print("--")
-    
-    # Long-run being empty bed:
-    print("Long-run probability of critical patient finds an available bed")
-    print((system.time - system.time_beds_full) / system.time)
-    print("--")
-    
-    # Joint:
-    
-    print("Joint")
-    print(((system.time - system.time_beds_full) / system.time) * ((system.time - system.time_triage_full) / system.time))
-    print("--")
-    
-    # Average num people rejected due bed unavailability:
-    
-    print("Average number of people rejected due to bed unavailability")
-    print(system.num_patients_rejected_beds / system.num_patients_arrived_beds) 
-    print("--")
-    
-    # Average utilization of each nurse:
     
-    print("Average utilization of each nurse")
-    utillist1 = []
-    for i in system.nurse_list:
-        worked = i.worked_time
-        util = (worked / system.time)
-        utillist1.append(util)
-    print(stat.mean(utillist1))
-    print("--")
-    
-    # Average number of occupied beds:
-    
-    print("Average number of occupied beds")
-    utillist2 = []
-    for i in system.bed_list:
-        occupied = i.occupied_time
-        util = (occupied / system.time)
-        utillist2.append(util)
-    avg = stat.mean(utillist2)
-    print(avg)
-    print("--")
-    
-    # Average number of patients treated at home:
-    
-    print("Average number of patients treated at home")
-    print(system.treated_home / (system.num_patients_arrived))
-    
-    # Average time a sick person gets better:
-    
-    print("Average time a sick person gets better")
-    time_spent_list = []
-    for i in system.patient_list:
-        added_time = i.exit_time - i.enter_time
-        if added_time > 0:
-            time_spent_list.append(added_time)
-    print(stat.mean(time_spent_list))
-
-
+    results = system.get_results()
+    for name, label in RESULT_LABELS.items():
+        print(label)
+        print(results[name])
+        print("--")
@@ -0,0 +1,166 @@
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from src import DEFAULT_SEED, RESULT_LABELS
+from replication import DEFAULT_PARAMS, confidence_interval, summarize, run_replication, spawn_seeds
+
+#Constraints of the staffing problem: metric name -> (direction, name of the target argument).
+#"max": the metric must be at most the target, "min": the metric must be at least the target.
+CONSTRAINTS = {"bed_rejection_ratio": ("max", "max_rejection"), "nurse_available": ("min", "min_nurse_available")}
+
+#Configurations (S', K') that violate a constraint whenever (S, K) violates it, per constraint:
+#   nurse_available does not depend on K and never decreases with S, so every S' <= S violates it,
+#   bed_rejection_ratio never decreases with fewer beds or more nurses (more nurses send critical patients to the beds sooner),
+#   so every K' <= K with S' >= S violates it.
+#The rejection ratio can decrease with fewer nurses, so a configuration is never pruned by more nurses and beds alone.
+VIOLATED_WITH = {"nurse_available": lambda other, pair: other[0] <= pair[0],
+                 "bed_rejection_ratio": lambda other, pair: other[1] <= pair[1] and other[0] >= pair[0]}
+
+#Function to run replications of many configurations, every (configuration, replication) pair is a task of the worker pool.
+#Replication r of every configuration is driven by the r-th spawned seed (common random numbers): every random stream
+#(arrivals, triage, routing, ...) gives the same numbers to all configurations, so their differences have low variance.
+#configurations is a list of dicts of changed parameters, results are returned per configuration in replication order.
+#Replications first .. first + count - 1 are run. executor is a ProcessPoolExecutor with `workers` processes, or None.
+def run_configurations(params, configurations, first, count, seed=DEFAULT_SEED, executor=None, workers=1):
+    seeds = spawn_seeds(seed, first + count)[first:]
+    tasks = [(dict(params, **configuration), child) for configuration in configurations for child in seeds]
+    if executor is None:
+        results = [run_replication(task_params, child) for task_params, child in tasks]
+    else:
+        chunksize = max(1, len(tasks) // (4 * workers))
+        results = list(executor.map(run_replication, [task[0] for task in tasks], [task[1] for task in tasks], chunksize=chunksize))
+    return [results[index * count:(index + 1) * count] for index in range(len(configurations))]
+
+#Function to create a worker pool of the given number of processes (default: all cores). Returns (executor, workers),
+#executor is None if the tasks should run in the calling process.
+def create_executor(workers):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return (ProcessPoolExecutor(max_workers=workers) if workers > 1 else None), workers
+
+#Function to run the same replications for every (S, K) pair of the grid with common random numbers.
+#Returns {(S, K): {"replications": [...], "summary": {...}}} (see replication.summarize).
+def sweep(params, S_values, K_values, replications, seed=DEFAULT_SEED, workers=None, confidence=0.95):
+    configurations = [{"S": S, "K": K} for S, K in itertools.product(S_values, K_values)]
+    executor, workers = create_executor(workers)
+    try:
+        results = run_configurations(params, configurations, 0, replications, seed, executor, workers)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return {(configuration["S"], configuration["K"]): {"replications": results_of, "summary": summarize(results_of, confidence)}
+            for configuration, results_of in zip(configurations, results)}
+
+#Function to decide the feasibility of a configuration from its replications.
+#Returns (status, violated): status is "feasible" if the confidence interval of every constraint is on the right side of its
+#target, "infeasible" if the interval of any constraint is on the wrong side, otherwise "undecided"; violated is the list
+#of the constraints on the wrong side. With final=True undecided constraints are decided by their point estimates.
+def check_feasibility(replications, targets, confidence, final=False):
+    status = "feasible"
+    violated = []
+    for name, (direction, target_name) in CONSTRAINTS.items():
+        interval = confidence_interval([result[name] for result in replications], confidence)
+        if final:
+            lower = upper = interval["mean"]
+        else:
+            lower = interval["lower"]
+            upper = interval["upper"]
+        target = targets[target_name]
+        if direction == "max":
+            satisfied, is_violated = upper <= target, lower > target
+        else:
+            satisfied, is_violated = lower >= target, upper < target
+        if is_violated:
+            violated.append(name)
+        elif not satisfied:
+            status = "undecided"
+    return ("infeasible" if violated else status), violated
+
+#Function to find the cheapest staffing (S, K) of the grid that meets the targets on the bed rejection ratio and the nurse availability.
+#Cost of a configuration is nurse_cost * S + bed_cost * K. Sequential feasibility screening (ranking and selection):
+#   every stage adds `stage` replications (common random numbers) to the configurations that are still undecided and
+#   decides feasibility with Bonferroni-corrected confidence intervals, so that all decisions hold with probability `confidence`.
+#   Dominated pairs are pruned without simulating them: an infeasible pair rules out the pairs that violate the same
+#   constraint (see VIOLATED_WITH), and every pair costlier than a feasible pair (or above it) is not needed.
+#   The search stops when the cheapest configuration that is not infeasible is feasible. After max_replications
+#   the remaining configurations are decided by their point estimates.
+def optimize_staffing(params, S_values, K_values, max_rejection=0.05, min_nurse_available=0.5, nurse_cost=1.0, bed_cost=1.0,
+                      seed=DEFAULT_SEED, workers=None, confidence=0.95, initial=10, stage=10, max_replications=200):
+    targets = {"max_rejection": max_rejection, "min_nurse_available": min_nurse_available}
+    candidates = sorted(itertools.product(S_values, K_values), key=lambda pair: (nurse_cost * pair[0] + bed_cost * pair[1], pair))
+    cost = {pair: nurse_cost * pair[0] + bed_cost * pair[1] for pair in candidates}
+    status = {pair: "undecided" for pair in candidates}
+    replications = {pair: [] for pair in candidates}
+    violated = {pair: [] for pair in candidates}
+    level = 1 - (1 - confidence) / (len(candidates) * len(CONSTRAINTS))
+    executor, workers = create_executor(workers)
+    try:
+        count = initial
+        while True:
+            #Only the configurations that can still be the answer are simulated: the undecided ones up to the cheapest feasible one.
+            active = []
+            for pair in candidates:
+                if status[pair] == "feasible":
+                    break
+                if status[pair] == "undecided":
+                    active.append(pair)
+            if not active:
+                break
+            first = len(replications[active[0]])
+            final = first + count >= max_replications
+            count = min(count, max_replications - first)
+            results = run_configurations(params, [{"S": S, "K": K} for S, K in active], first, count, seed, executor, workers)
+            for pair, new_results in zip(active, results):
+                replications[pair].extend(new_results)
+                status[pair], violated[pair] = check_feasibility(replications[pair], targets, level, final)
+            for pair in active:
+                if status[pair] == "infeasible":
+                    for other in candidates:
+                        if status[other] == "undecided" and any(VIOLATED_WITH[name](other, pair) for name in violated[pair]):
+                            status[other] = "dominated"
+                elif status[pair] == "feasible":
+                    for other in candidates:
+                        if status[other] == "undecided" and (cost[other] > cost[pair] or (other[0] >= pair[0] and other[1] >= pair[1])):
+                            status[other] = "dominated"
+            count = stage
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    best = next((pair for pair in candidates if status[pair] == "feasible"), None)
+    return {"best": best,
+            "cost": cost[best] if best is not None else None,
+            "summary": summarize(replications[best], confidence) if best is not None else None,
+            "status": status,
+            "replications": {pair: len(replications[pair]) for pair in candidates},
+            "total_replications": sum(len(results) for results in replications.values())}
+
+#Command line entry point of the staffing optimiser.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the cheapest number of nurses and beds that meets the service targets.")
+    parser.add_argument("--S", type=int, nargs="+", default=list(range(2, 9)), help="numbers of triage nurses to consider")
+    parser.add_argument("--K", type=int, nargs="+", default=list(range(4, 16)), help="numbers of hospital beds to consider")
+    parser.add_argument("--max_rejection", type=float, default=0.05, help="largest acceptable bed rejection ratio")
+    parser.add_argument("--min_nurse_available", type=float, default=0.5, help="smallest acceptable probability of finding an available nurse")
+    parser.add_argument("--nurse_cost", type=float, default=1.0, help="cost of a nurse")
+    parser.add_argument("--bed_cost", type=float, default=1.0, help="cost of a bed")
+    parser.add_argument("--limit", type=int, default=10000, help="number of healed patients to stop every replication")
+    parser.add_argument("--max_replications", type=int, default=200, help="largest number of replications of a configuration")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="root seed of the replications")
+    parser.add_argument("--confidence", type=float, default=0.95, help="probability that all feasibility decisions are correct")
+    arguments = parser.parse_args(argv)
+    params = dict(DEFAULT_PARAMS, healed_patients_limit=arguments.limit)
+    output = optimize_staffing(params, arguments.S, arguments.K, arguments.max_rejection, arguments.min_nurse_available, arguments.nurse_cost,
+                               arguments.bed_cost, arguments.seed, arguments.workers, arguments.confidence, max_replications=arguments.max_replications)
+    print("Replications: " + str(output["total_replications"]) + " (full grid: " + str(arguments.max_replications * len(output["status"])) + ")")
+    if output["best"] is None:
+        print("No configuration meets the targets.")
+        return
+    print("Cheapest staffing: S = " + str(output["best"][0]) + ", K = " + str(output["best"][1]) + ", cost " + str(output["cost"]))
+    for name in CONSTRAINTS:
+        row = output["summary"][name]
+        print(RESULT_LABELS[name] + ": " + str(row["mean"]) + " +- " + str(row["half_width"]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from src import HealthcareSystem, DEFAULT_SEED, RESULT_LABELS
+from replication import DEFAULT_PARAMS, confidence_interval, spawn_seeds, t_quantile
+from analytic import erlang_b, erlang_c, analytic_validity
+
+#Control variables observed in every replication. Their expectations are known from the parameters (see control_means):
+#   sample means of the sampled variates (exact expectations 1/myLambda, 1/mu_t, 1/mu_cb, 1/mu_s),
+#   triage_wait: fraction of arrivals that waited for a nurse, Erlang C of the M/M/S triage stage,
+#   bed_rejection: fraction of critical patients rejected from beds, Erlang B of the M/M/K/K bed stage.
+#The Erlang expectations hold in steady state only, so they are used only where analytic.analytic_validity accepts the run.
+CONTROL_NAMES = ("interarrival", "nurse_service", "hospital_healing", "home_healing_s", "triage_wait", "bed_rejection")
+
+#Output metrics that are the same random quantity as a control. A control is not used for its own metrics:
+#by PASTA the fraction of arrivals that waited is the fraction of time all nurses are busy, 1 - nurse_available.
+CONTROL_METRICS = {"bed_rejection": ("bed_rejection_ratio",), "triage_wait": ("nurse_available", "joint")}
+
+#Function to calculate the known expectations of the controls. Erlang controls are left out unless the steady-state
+#approximation is valid for the run. (see analytic.analytic_validity)
+def control_means(params):
+    means = {"interarrival": 1 / params["myLambda"], "nurse_service": 1 / params["mu_t"], "hospital_healing": 1 / params["mu_cb"],
+             "home_healing_s": 1 / params["mu_s"]}
+    if analytic_validity(params) is None:
+        means["triage_wait"] = erlang_c(params["S"], params["myLambda"] / params["mu_t"])
+        means["bed_rejection"] = erlang_b(params["K"], params["myLambda"] * (1 - params["p1"]) / params["mu_cb"])
+    return means
+
+#Function to get the mean of a sampled variate (see VARIATE_NAMES) of a finished simulation with any retention.
+def _variate_mean(system, name):
+    if system.streaming or system.columnar:
+        statistic = system.variate_statistics[name]
+        statistic.flush()
+        return statistic.mean if statistic.count > 0 else math.nan
+    values = getattr(system, {"interarrival": "interarrival_array", "nurse_service": "nurse_service_array",
+                              "hospital_healing": "hospital_healing_array", "home_healing_s": "home_healing_array_s"}[name])
+    return math.fsum(values) / len(values) if values else math.nan
+
+#Function to run a single replication and observe its results and controls. Defined at module level for the worker processes.
+def run_controlled_replication(params, seed, antithetic=False):
+    system = HealthcareSystem(seed=seed, antithetic=antithetic, **params)
+    system.run_simulation()
+    results = system.get_results()
+    controls = {name: _variate_mean(system, name) for name in ("interarrival", "nurse_service", "hospital_healing", "home_healing_s")}
+    controls["triage_wait"] = system.num_patients_waiting_triage / system.num_patients_arrived
+    controls["bed_rejection"] = results["bed_rejection_ratio"]
+    return {"results": results, "controls": controls}
+
+#Function to run replications in a process pool (see replication.run_replications). tasks is a list of (seed, antithetic).
+def _run_tasks(params, tasks, workers):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(tasks) <= 1:
+        return [run_controlled_replication(params, seed, antithetic) for seed, antithetic in tasks]
+    chunksize = max(1, len(tasks) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_controlled_replication, [params] * len(tasks), [task[0] for task in tasks], [task[1] for task in tasks],
+                                 chunksize=chunksize))
+
+#Function to estimate every metric with antithetic pairs: pair i runs the i-th spawned seed once with U and once with 1 - U
+#for every uniform, and the estimate is the mean of the pair averages.
+#variance_reduction is the variance of the mean of 2 * pairs independent replications divided by the variance of the
+#antithetic estimate; the first is estimated from the same 2 * pairs runs. (> 1: the pairs pay off)
+def antithetic_estimates(params, pairs, seed=DEFAULT_SEED, workers=None, confidence=0.95):
+    tasks = [(child, antithetic) for child in spawn_seeds(seed, pairs) for antithetic in (False, True)]
+    outputs = _run_tasks(params, tasks, workers)
+    estimates = {}
+    for name in RESULT_LABELS:
+        values = [output["results"][name] for output in outputs]
+        pair_values = [(values[2 * i] + values[2 * i + 1]) / 2 for i in range(pairs)]
+        estimate = confidence_interval(pair_values, confidence)
+        independent = confidence_interval(values, confidence)
+        estimate["variance_reduction"] = (independent["variance"] / independent["n"]) / (estimate["variance"] / estimate["n"]) if estimate["variance"] > 0 else math.nan
+        estimates[name] = estimate
+    return estimates
+
+#Function to calculate the control-variate estimate of the mean of y with the controls (n x q array) of known means.
+#The coefficients are fitted by least squares, the variance of the estimate is s_e^2 * (1/n + d' (C'C)^-1 d) with
+#s_e^2 the residual variance and d the deviation of the control means, and the interval uses n - q - 1 degrees of freedom.
+#Controls that are constant over the replications are left out. variance_reduction is Var(mean of y) / Var(estimate).
+def control_variate_estimate(y, controls, means, confidence=0.95):
+    y = np.asarray(y, dtype=float)
+    controls = np.asarray(controls, dtype=float).reshape(len(y), -1)
+    means = np.asarray(means, dtype=float)
+    keep = np.ptp(controls, axis=0) > 0 if len(y) > 0 else np.zeros(len(means), dtype=bool)
+    controls = controls[:, keep]
+    means = means[keep]
+    n, q = controls.shape
+    if n - q - 1 < 1:
+        result = confidence_interval(y.tolist(), confidence)
+        result["variance_reduction"] = math.nan
+        result["beta"] = []
+        return result
+    centered = controls - controls.mean(axis=0)
+    beta = np.linalg.lstsq(centered, y - y.mean(), rcond=None)[0]
+    deviation = controls.mean(axis=0) - means
+    mean = float(y.mean() - deviation @ beta)
+    residuals = (y - y.mean()) - centered @ beta
+    residual_variance = float(residuals @ residuals) / (n - q - 1)
+    variance = residual_variance * (1 / n + float(deviation @ np.linalg.solve(centered.T @ centered, deviation)))
+    half_width = t_quantile(1.0 - (1.0 - confidence) / 2.0, n - q - 1) * math.sqrt(variance)
+    plain_variance = float(y.var(ddof=1)) / n
+    return {"n": n, "mean": mean, "variance": variance * n, "half_width": half_width, "lower": mean - half_width, "upper": mean + half_width,
+            "variance_reduction": plain_variance / variance if variance > 0 else math.nan, "beta": beta.tolist()}
+
+#Function to estimate every metric from independent replications with control variates. (see CONTROL_NAMES)
+#Replications where the metric or a control is nan are left out for that metric.
+def control_variate_estimates(params, replications, seed=DEFAULT_SEED, workers=None, confidence=0.95, controls=CONTROL_NAMES):
+    outputs = _run_tasks(params, [(child, False) for child in spawn_seeds(seed, replications)], workers)
+    known = control_means(params)
+    estimates = {}
+    for name in RESULT_LABELS:
+        used = [control for control in controls if control in known and name not in CONTROL_METRICS.get(control, ())]
+        rows = [(output["results"][name], [output["controls"][control] for control in used]) for output in outputs]
+        rows = [row for row in rows if not math.isnan(row[0]) and not any(math.isnan(value) for value in row[1])]
+        estimate = control_variate_estimate([row[0] for row in rows], [row[1] for row in rows], [known[control] for control in used], confidence)
+        estimate["controls"] = used
+        estimates[name] = estimate
+    return estimates
+
+#Command line entry point of the variance reduction estimators.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate the metrics with antithetic pairs or control variates and report the variance reduction.")
+    parser.add_argument("method", choices=("antithetic", "control"), help="variance reduction technique")
+    parser.add_argument("-R", "--replications", type=int, default=100, help="number of replications (antithetic: number of pairs)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="root seed of the replications")
+    parser.add_argument("--confidence", type=float, default=0.95, help="confidence level of the intervals")
+    parser.add_argument("--limit", type=int, default=10000, help="number of healed patients to stop the simulation")
+    parser.add_argument("--start_type", choices=("empty", "half", "full"), default=DEFAULT_PARAMS["start_type"], help="start condition of the system")
+    arguments = parser.parse_args(argv)
+    params = dict(DEFAULT_PARAMS, healed_patients_limit=arguments.limit, start_type=arguments.start_type)
+    if arguments.method == "antithetic":
+        estimates = antithetic_estimates(params, arguments.replications, arguments.seed, arguments.workers, arguments.confidence)
+    else:
+        estimates = control_variate_estimates(params, arguments.replications, arguments.seed, arguments.workers, arguments.confidence)
+    for name, label in RESULT_LABELS.items():
+        row = estimates[name]
+        print(label)
+        print("estimate: " + str(row["mean"]) + " +- " + str(row["half_width"]) + "  variance reduction: " + str(round(row["variance_reduction"], 3)))
+        print("--")
+
+if __name__ == "__main__":
+    main()